@@ -1,17 +1,23 @@
 # PPC Analyst - Flask application
 """Flask app: routes, APIs, and scheduler."""
 import csv
+import functools
+import hashlib
 import io
-import json
 import logging
+import re
+import threading
 from datetime import datetime, timezone
 
-from flask import Flask, flash, redirect, render_template, request, url_for
+from flask import Flask, Response, flash, g, make_response, redirect, render_template, request, stream_with_context, url_for
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
+import orjson
 
 import logger as app_logger
+import tasks
 from config import DEBUG, SECRET_KEY
-from db import init_db, cursor, utc_now
+from db import init_db, cursor, read_cursor, utc_now
 from data import (
     list_jobs,
     get_job,
@@ -22,20 +28,13 @@ from data import (
     get_target,
     add_targets,
     get_competitors,
-    get_competitor_ads,
+    iter_competitor_ads,
+    get_synced_at,
     get_competitor_aggregates,
     get_ad_by_id_or_external,
+    list_top_advertisers,
 )
-from services.serpapi_service import run_target as serp_run_target
-from services.crawl_service import crawl_and_save
-from services.atc_service import atc_list, atc_details
-from services.trends_service import fetch_trends
-from services.brand_service import list_brand_assets, add_brand_asset, scan_ads_for_brand, list_violations, generate_complaint_doc, update_violation_status
-from services.auction_insights_service import compute_auction_insights
-from services.lpe_service import run_lpe_batch_for_job
-from services.creative_threat_service import list_watchlist, add_to_watchlist, poll_watchlist_and_alert
-from services.budget_exhaustion_service import run_budget_tracking_cycle, run_budget_tracking_for_target, get_presence_24h
-from utils import redact_api_keys
+from utils import TTLCache, split_keywords
 
 app_logger  # ensure logging is configured
 
@@ -43,18 +42,132 @@ app = Flask(__name__, template_folder="Templates")
 app.config["SECRET_KEY"] = SECRET_KEY
 app.config["DEBUG"] = DEBUG
 
+# Compress JSON / CSV / HTML responses when flask-compress is installed (zstd/br/gzip are C-level).
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+if Compress is not None:
+    app.config["COMPRESS_MIMETYPES"] = ["application/json", "text/csv", "text/html"]
+    app.config["COMPRESS_ALGORITHM"] = ["zstd", "br", "gzip"]
+    app.config["COMPRESS_LEVEL"] = 3
+    Compress(app)
+
 logger = logging.getLogger(__name__)
 
 # Ensure DB exists when app is loaded (e.g. under gunicorn/uwsgi; also when run via python app.py)
 init_db()
+# Tasks left pending/running by a previous process never finish.
+tasks.fail_stale()
 
 # Scheduler (for Phase 7, 9 - creative threat and budget exhaustion)
-scheduler = BackgroundScheduler()
+# Both jobs are SerpAPI/DB round-trips (I/O-bound), so they share a thread pool; forking this multi-threaded
+# process for them would copy held locks and pooled keep-alive sockets into the child.
+scheduler = BackgroundScheduler(
+    executors={"default": ThreadPoolExecutor(4)},
+    job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 300},
+)
+
+
+# Constant payloads serialized once at import.
+_OK_JSON = orjson.dumps({"ok": True})
+_STATUS_JSON = orjson.dumps({"status": "ok"})
+
+
+def _json(obj, status=200):
+    """JSON response serialized with orjson (handles datetimes and numpy values natively)."""
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype="application/json",
+    )
+
+
+# Short-lived cache for read-heavy JSON endpoints; data only changes when a run/scan/job finishes.
+# Writes and finished tasks clear this process's copy only; other workers can serve stale reads until the TTL expires.
+_response_cache = TTLCache(maxsize=256, ttl=60)
+tasks.on_done(_response_cache.clear)
+
+
+def _cached_json(view):
+    """Cache a GET JSON view's body for a short TTL, keyed by path + query string."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        hit = _response_cache.get(key)
+        if hit is not None:
+            resp = app.response_class(hit[0], mimetype="application/json")
+            resp.last_modified = hit[1]
+            return resp
+        resp = view(*args, **kwargs)
+        if resp.status_code == 200:
+            _response_cache.set(key, (resp.get_data(), resp.last_modified))
+        return resp
+    return wrapper
+
+
+def _last_modified(synced_at_utc):
+    """Parse a stored "YYYY-MM-DDTHH:MM:SSZ" timestamp for use as Last-Modified (None if missing/bad)."""
+    if not synced_at_utc:
+        return None
+    try:
+        return datetime.strptime(synced_at_utc, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _query_args(**spec):
+    """Inject typed query-string args into the view: name=(type, default). Bad values fall back to the default."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            get = request.args.get
+            for name, (typ, default) in spec.items():
+                kwargs[name] = get(name, default, type=typ)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Longest lookback any analytics view accepts; bigger ?days= values would just scan (and overflow) needlessly.
+MAX_DAYS = 365
+
+
+def _days(value) -> int:
+    """_query_args type for ?days=: an int clamped to 1..MAX_DAYS (non-numbers fall back to the default)."""
+    return min(max(int(value), 1), MAX_DAYS)
+
+
+# Whole comma/space separated integer tokens in an id list like "12, 15,x,7".
+_ID_RE = re.compile(r"(?<![^,\s])\d+(?![^,\s])")
+
+
+def _body():
+    """Request payload: parsed JSON for JSON requests, else the form (no body sniffing for form posts)."""
+    if g.wants_json:
+        return request.get_json(force=True, silent=True) or {}
+    return request.form
 
 
 @app.before_request
-def _ensure_db():
-    pass  # init_db is called at startup
+def _detect_json():
+    # init_db is called at startup; here we only resolve the content type once per request.
+    ct = request.content_type
+    g.wants_json = bool(ct) and "application/json" in ct
+
+
+@app.after_request
+def _conditional_json(response):
+    if request.method in ("POST", "PUT", "PATCH", "DELETE"):
+        # Any write (run, scan, status change, ...) may change what the cached reads return.
+        _response_cache.clear()
+    elif request.method in ("GET", "HEAD") and response.status_code == 200 and response.mimetype == "application/json" and not response.is_streamed:
+        if request.path == "/api/status":
+            response.cache_control.public = True
+            response.cache_control.max_age = 30
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest())
+        response.make_conditional(request)
+    return response
 
 
 # ----- Page routes -----
@@ -103,7 +216,7 @@ def add_targets_route(job_id: int):
     if not job:
         return "Project not found", 404
     keywords_raw = request.form.get("keywords") or ""
-    keywords = [k.strip() for k in keywords_raw.replace("\n", ",").split(",") if k.strip()]
+    keywords = split_keywords(keywords_raw)
     location = (request.form.get("location") or "").strip()
     gl = (request.form.get("gl") or "us").strip()
     hl = (request.form.get("hl") or "en").strip()
@@ -114,37 +227,50 @@ def add_targets_route(job_id: int):
 
 @app.route("/research/<int:job_id>/run-target/<int:target_id>", methods=["POST"])
 def run_target(job_id: int, target_id: int):
+    from services.serpapi_service import run_target as serp_run_target
     target = get_target(target_id)
     if not target or target["job_id"] != job_id:
         return "Target not found", 404
-    try:
-        count = serp_run_target(
-            target_id,
-            job_id,
-            target["keyword"],
-            target["serp_location"] or target["location_input"],
-            target["gl"] or "us",
-            target["hl"] or "en",
-        )
-        if count:
-            flash(f"Run complete: {count} snapshot(s) captured.")
-        else:
-            flash("Run produced no snapshots (check SERPAPI_API_KEY and logs).", "warning")
-    except Exception as e:
-        logger.exception("Run target failed: %s", e)
-        flash(f"Run failed: {redact_api_keys(str(e))[:200]}", "danger")
+    task_id = tasks.submit(
+        "run_target",
+        serp_run_target,
+        target_id,
+        job_id,
+        target["keyword"],
+        target["serp_location"] or target["location_input"],
+        target["gl"] or "us",
+        target["hl"] or "en",
+        job_id=job_id,
+    )
+    if g.wants_json:
+        return _json({"task_id": task_id}, 202)
+    flash("Run started in the background; refresh in a minute to see the new snapshots.")
+    return redirect(url_for("research", job_id=job_id))
+
+
+@app.route("/research/<int:job_id>/run-all", methods=["POST"])
+def run_all_targets(job_id: int):
+    """Run every target in the project concurrently in one background task."""
+    from services.serpapi_service import run_targets
+    job = get_job(job_id)
+    if not job:
+        return "Project not found", 404
+    targets = list_targets(job_id)
+    task_id = tasks.submit("run_all", run_targets, job_id, targets, job_id=job_id)
+    if g.wants_json:
+        return _json({"task_id": task_id, "targets": len(targets)}, 202)
+    flash(f"Running {len(targets)} target(s) in the background; refresh in a minute to see the new snapshots.")
     return redirect(url_for("research", job_id=job_id))
 
 
 @app.route("/research/<int:job_id>/competitor/<path:advertiser>")
-def competitor_page(job_id: int, advertiser: str):
+@_query_args(days=(_days, 30), device=(str, "all"))
+def competitor_page(job_id: int, advertiser: str, days: int, device: str):
     job = get_job(job_id)
     if not job:
         return "Project not found", 404
-    days = int(request.args.get("days", 30))
-    device = request.args.get("device", "all")
     ag = get_competitor_aggregates(job_id, advertiser, days, device)
-    return render_template(
+    html = render_template(
         "competitor.html",
         job=job,
         advertiser=advertiser,
@@ -161,19 +287,20 @@ def competitor_page(job_id: int, advertiser: str):
         synced_at_utc=ag["synced_at_utc"],
         title=f"{advertiser} - {job['name']}",
     )
+    resp = make_response(html)
+    resp.last_modified = _last_modified(ag["synced_at_utc"])
+    return resp.make_conditional(request)
 
 
 @app.route("/research/<int:job_id>/geo")
-def geo_page(job_id: int):
+@_query_args(days=(_days, 30), device=(str, "all"))
+def geo_page(job_id: int, days: int, device: str):
     def _geo_context(jid):
         job = get_job(jid)
         if not job:
             return None
         advertiser = request.args.get("advertiser", "")
-        days = int(request.args.get("days", 30))
-        device = request.args.get("device", "all")
-        comp_data = get_competitors(jid, days, device)
-        competitors = [c["advertiser"] for c in (comp_data.get("competitors") or [])[:100]]
+        competitors = list_top_advertisers(jid, days, device, limit=100)
         if not advertiser:
             return {
                 "job": job, "advertiser": "", "days": days, "device": device,
@@ -191,107 +318,188 @@ def geo_page(job_id: int):
     return render_template("geo.html", **ctx)
 
 
+_export_local = threading.local()
+
+
+def _export_writer():
+    """Return this thread's reusable (bytes buffer, csv writer) pair for exports, emptied."""
+    pair = getattr(_export_local, "pair", None)
+    if pair is None:
+        raw = io.BytesIO()
+        pair = _export_local.pair = (raw, csv.writer(io.TextIOWrapper(raw, encoding="utf-8", newline="", write_through=True)))
+    pair[0].seek(0)
+    pair[0].truncate(0)
+    return pair
+
+
 @app.route("/research/<int:job_id>/export.csv")
 def export_job_csv(job_id: int):
     job = get_job(job_id)
     if not job:
         return "Project not found", 404
-    with cursor() as cur:
-        cur.execute(
-            """SELECT a.id, a.advertiser, a.ad_id, a.device, a.block, a.headline, a.description, a.displayed_link,
-            a.destination_link, a.position, a.created_at_utc, t.keyword, t.location_input
-            FROM ads a LEFT JOIN serp_snapshots s ON a.snapshot_id = s.id LEFT JOIN targets t ON s.target_id = t.id
-            WHERE a.job_id = ? ORDER BY a.created_at_utc DESC""",
-            (job_id,),
-        )
-        rows = cur.fetchall()
-    out = io.StringIO()
-    w = csv.writer(out)
-    w.writerow(["id", "advertiser", "ad_id", "device", "block", "headline", "description", "displayed_link", "destination_link", "position", "created_at_utc", "keyword", "location"])
-    for r in rows:
-        w.writerow([r["id"], r["advertiser"], r["ad_id"], r["device"], r["block"], r["headline"], r["description"], r["displayed_link"], r["destination_link"], r["position"], r["created_at_utc"], r["keyword"], r["location_input"]])
-    out.seek(0)
-    return out.getvalue(), 200, {"Content-Type": "text/csv", "Content-Disposition": f"attachment; filename=project_{job_id}_export.csv"}
+
+    def generate():
+        # Stream rows in batches so large projects don't materialize the whole CSV in memory.
+        # csv writes through to a bytes buffer so each chunk is yielded already encoded.
+        raw, w = _export_writer()
+
+        def drain():
+            chunk = raw.getvalue()
+            raw.seek(0)
+            raw.truncate(0)
+            return chunk
+
+        w.writerow(["id", "advertiser", "ad_id", "device", "block", "headline", "description", "displayed_link", "destination_link", "position", "created_at_utc", "keyword", "location"])
+        yield drain()
+        with read_cursor() as cur:
+            # Plain tuples (no sqlite3.Row per row): the CSV writer only needs positional values.
+            cur.row_factory = None
+            cur.arraysize = 5000
+            cur.execute(
+                """SELECT a.id, a.advertiser, a.ad_id, a.device, a.block, a.headline, a.description, a.displayed_link,
+                a.destination_link, a.position, a.created_at_utc, t.keyword, t.location_input
+                FROM ads a LEFT JOIN serp_snapshots s ON a.snapshot_id = s.id LEFT JOIN targets t ON s.target_id = t.id
+                WHERE a.job_id = ? ORDER BY a.created_at_utc DESC""",
+                (job_id,),
+            )
+            while True:
+                rows = cur.fetchmany()
+                if not rows:
+                    break
+                # Rows are already in column order; writerows keeps the per-row loop in C.
+                w.writerows(rows)
+                yield drain()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=project_{job_id}_export.csv"},
+    )
 
 
 # ----- JSON APIs -----
 
 
+@app.route("/api/task/<task_id>")
+def api_task(task_id: str):
+    """Poll a background task started by run-target, scan-brand, lpe-batch, ..."""
+    task = tasks.get_task(task_id)
+    if not task:
+        return _json({"error": "Task not found"}, 404)
+    return _json(task)
+
+
 @app.route("/api/status")
 def api_status():
     """Health/status check; returns 200 OK."""
-    return app.response_class(
-        response=json.dumps({"status": "ok"}),
-        mimetype="application/json",
-    )
+    return app.response_class(_STATUS_JSON, mimetype="application/json")
 
 
 @app.route("/api/research/<int:job_id>/competitors")
-def api_competitors(job_id: int):
-    days = int(request.args.get("days", 30))
-    device = request.args.get("device", "all")
+@_cached_json
+@_query_args(days=(_days, 30), device=(str, "all"))
+def api_competitors(job_id: int, days: int, device: str):
     out = get_competitors(job_id, days, device)
-    return app.response_class(response=json.dumps(out), mimetype="application/json")
+    resp = _json(out)
+    resp.last_modified = _last_modified(out.get("synced_at_utc"))
+    return resp
 
 
 @app.route("/api/research/<int:job_id>/competitor/<path:advertiser>/ads")
-def api_competitor_ads(job_id: int, advertiser: str):
+@_query_args(days=(_days, 30), device=(str, "all"))
+def api_competitor_ads(job_id: int, advertiser: str, days: int, device: str):
     advertiser = (advertiser or "").strip()
     if not advertiser:
-        return json.dumps({"error": "Advertiser is required", "ads": []}), 400, {"Content-Type": "application/json"}
-    days = int(request.args.get("days", 30))
-    device = request.args.get("device", "all")
+        return _json({"error": "Advertiser is required", "ads": []}, 400)
     offer = request.args.get("offer", "").strip() or None
-    out = get_competitor_ads(job_id, advertiser, days, device, offer)
-    # Serialize for JSON (datetime, None)
-    ads_ser = []
-    for a in out["ads"]:
-        ad = {k: (v.isoformat() if hasattr(v, "isoformat") else v) for k, v in a.items()}
-        ad["created_at_utc"] = a.get("created_at_utc") or ""
-        ads_ser.append(ad)
-    return app.response_class(response=json.dumps({"ads": ads_ser, "synced_at_utc": out["synced_at_utc"]}), mimetype="application/json")
+    synced = get_synced_at(job_id)
+    ads = iter_competitor_ads(job_id, advertiser, days, device, offer)
+    # Run the query before the 200 goes out, so a failing query is an ordinary error response.
+    first = next(ads, None)
+
+    def generate():
+        # Up to 500 ads with offers/extensions: emit them as the cursor yields instead of building the whole body.
+        yield b'{"ads":['
+        error = None
+        try:
+            if first is not None:
+                yield orjson.dumps(first)
+                for ad in ads:
+                    yield b"," + orjson.dumps(ad)
+        except Exception as e:
+            # Headers are already sent; close the JSON and report the failure in the body.
+            logger.exception("Competitor ads stream failed: %s", e)
+            error = "Failed to load all ads"
+        tail = b'],"synced_at_utc":' + orjson.dumps(synced)
+        if error:
+            tail += b',"error":' + orjson.dumps(error)
+        yield tail + b"}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 
 @app.route("/api/ad/<ad_id>/crawl", methods=["POST"])
 def api_ad_crawl(ad_id):
+    from services.crawl_service import crawl_and_save
     ad = get_ad_by_id_or_external(ad_id)
     if not ad:
-        return json.dumps({"error": "Ad not found"}), 404, {"Content-Type": "application/json"}
+        return _json({"error": "Ad not found"}, 404)
     url = ad.get("destination_link") or ""
     if not url or not url.startswith("http"):
-        return json.dumps({"error": "No destination URL", "synced_at_utc": None}), 400, {"Content-Type": "application/json"}
-    try:
-        crawl = crawl_and_save(ad["id"], url)
-        return app.response_class(response=json.dumps(crawl), mimetype="application/json")
-    except Exception as e:
-        logger.exception("Crawl failed: %s", e)
-        return json.dumps({"error": redact_api_keys(str(e)), "synced_at_utc": None}), 500, {"Content-Type": "application/json"}
+        return _json({"error": "No destination URL", "synced_at_utc": None}, 400)
+    # Page fetch + PageSpeed take seconds; run them in the background and let the page poll /api/task/<id>.
+    task_id = tasks.submit("crawl_ad", crawl_and_save, ad["id"], url)
+    return _json({"task_id": task_id}, 202)
+
+
+@app.route("/api/ads/crawl", methods=["POST"])
+def api_ads_crawl():
+    """Crawl several ads' landing pages concurrently in the background. Body: {"ad_ids": [...]}."""
+    from services.crawl_service import crawl_many
+    if g.wants_json:
+        body = _body()
+        ad_ids = body.get("ad_ids") if isinstance(body, dict) else None
+        if not isinstance(ad_ids, list):
+            return _json({"error": "ad_ids must be a list"}, 400)
+    else:
+        ad_ids = request.form.getlist("ad_ids")
+    pairs = []
+    for ad_id in ad_ids[:100]:
+        ad = get_ad_by_id_or_external(ad_id)
+        url = (ad or {}).get("destination_link") or ""
+        if url.startswith("http"):
+            pairs.append((ad["id"], url))
+    if not pairs:
+        return _json({"error": "No crawlable ads"}, 400)
+    task_id = tasks.submit("crawl_many", crawl_many, pairs)
+    return _json({"task_id": task_id, "ads": len(pairs)}, 202)
 
 
 @app.route("/api/atc/list")
-def api_atc_list():
-    advertiser = request.args.get("advertiser", "")
-    region = request.args.get("region", "US")
-    page = int(request.args.get("page", 1))
+@_query_args(advertiser=(str, ""), region=(str, "US"), page=(int, 1))
+def api_atc_list(advertiser: str, region: str, page: int):
+    from services.atc_service import atc_list
     out = atc_list(advertiser, region, page)
-    return app.response_class(response=json.dumps(out), mimetype="application/json")
+    return _json(out)
 
 
 @app.route("/api/atc/details")
 def api_atc_details():
+    from services.atc_service import atc_details
     ad_id = request.args.get("ad_id", "")
     region = request.args.get("region", "US")
     out = atc_details(ad_id, region)
-    return app.response_class(response=json.dumps(out), mimetype="application/json")
+    return _json(out)
 
 
 @app.route("/api/trends")
 def api_trends():
+    from services.trends_service import cached_trends
     keywords = request.args.get("keywords", "")
     geo = request.args.get("geo", "US")
     timeframe = request.args.get("timeframe", "today 12-m")
-    out = fetch_trends(keywords, geo, timeframe)
-    return app.response_class(response=json.dumps(out), mimetype="application/json")
+    out = cached_trends(keywords, geo, timeframe)
+    return _json(out)
 
 
 # ----- Phase 2–9: Advanced APIs -----
@@ -299,139 +507,149 @@ def api_trends():
 
 @app.route("/api/research/<int:job_id>/brand-assets", methods=["GET", "POST"])
 def api_brand_assets(job_id: int):
+    from services.brand_service import add_brand_asset, list_brand_assets_for_job
     if request.method == "POST":
-        data = request.get_json(silent=True) or {}
-        term = (request.form.get("term") or data.get("term") or "").strip()
-        pattern_type = request.form.get("pattern_type") or data.get("pattern_type") or "literal"
-        regex = request.form.get("regex_pattern") or data.get("regex_pattern")
+        data = _body()
+        term = (data.get("term") or "").strip()
+        pattern_type = data.get("pattern_type") or "literal"
+        regex = data.get("regex_pattern")
         if term or regex:
             add_brand_asset(job_id, term, pattern_type, regex)
-        if request.is_json or request.content_type and "application/json" in request.content_type:
-            return app.response_class(response=json.dumps({"ok": True}), mimetype="application/json")
+        if g.wants_json:
+            return app.response_class(_OK_JSON, mimetype="application/json")
         return redirect(url_for("research", job_id=job_id))
-    assets = list_brand_assets(job_id) + list_brand_assets(None)
-    return app.response_class(response=json.dumps({"assets": assets}), mimetype="application/json")
+    assets = list_brand_assets_for_job(job_id)
+    return _json({"assets": assets})
 
 
 @app.route("/api/research/<int:job_id>/scan-brand", methods=["POST"])
 def api_scan_brand(job_id: int):
-    count = scan_ads_for_brand(job_id)
-    if request.is_json or (request.content_type and "application/json" in (request.content_type or "")):
-        return app.response_class(response=json.dumps({"scanned": count}), mimetype="application/json")
-    flash(f"Scan complete: {count} new violation(s) recorded." if count else "Scan complete: no new violations.")
+    from services.brand_service import scan_ads_for_brand
+    task_id = tasks.submit("scan_brand", scan_ads_for_brand, job_id, job_id=job_id)
+    if g.wants_json:
+        return _json({"task_id": task_id}, 202)
+    flash("Brand scan started in the background; refresh shortly to see new violations.")
     return redirect(url_for("brand_monitor_page", job_id=job_id))
 
 
 @app.route("/api/research/<int:job_id>/violations")
+@_cached_json
 def api_violations(job_id: int):
+    from services.brand_service import list_violations
     status = request.args.get("status")
     out = list_violations(job_id, status)
-    return app.response_class(response=json.dumps({"violations": [dict(v) for v in out]}), mimetype="application/json")
+    return _json({"violations": out})
 
 
 @app.route("/api/research/<int:job_id>/violations/<int:violation_id>/status", methods=["POST", "PATCH"])
 def api_violation_status(job_id: int, violation_id: int):
-    data = request.get_json(silent=True) or {}
-    new_status = (data.get("status") or request.form.get("status") or "").strip()
+    from services.brand_service import update_violation_status
+    new_status = (_body().get("status") or "").strip()
     if not new_status:
-        return json.dumps({"ok": False, "error": "status required"}), 400, {"Content-Type": "application/json"}
+        return _json({"ok": False, "error": "status required"}, 400)
     ok = update_violation_status(violation_id, job_id, new_status)
-    return app.response_class(response=json.dumps({"ok": ok}), mimetype="application/json")
+    return _json({"ok": ok})
 
 
 @app.route("/api/research/<int:job_id>/complaint-doc", methods=["POST"])
 def api_complaint_doc(job_id: int):
-    data = request.get_json(silent=True) if request.is_json else None
-    if request.is_json:
-        ids = (data or {}).get("violation_ids", [])
+    from services.brand_service import generate_complaint_doc
+    data = _body()
+    if g.wants_json:
+        ids = data.get("violation_ids", [])
     else:
-        raw = request.form.get("violation_ids")
-        ids = [int(x.strip()) for x in (raw or "").split(",") if str(x).strip().isdigit()]
+        raw = data.get("violation_ids")
+        ids = list(map(int, _ID_RE.findall(raw or "")))
     doc = generate_complaint_doc(ids)
     return app.response_class(response=doc, mimetype="text/plain", headers={"Content-Disposition": "attachment; filename=trademark_complaint_evidence.txt"})
 
 
 @app.route("/api/research/<int:job_id>/auction-insights")
-def api_auction_insights(job_id: int):
-    days = int(request.args.get("days", 30))
-    device = request.args.get("device", "all")
+@_cached_json
+@_query_args(days=(_days, 30), device=(str, "all"))
+def api_auction_insights(job_id: int, days: int, device: str):
+    from services.auction_insights_service import compute_auction_insights
     out = compute_auction_insights(job_id, days, device)
-    return app.response_class(response=json.dumps({"matrix": out}), mimetype="application/json")
+    return _json({"matrix": out})
 
 
 @app.route("/api/research/<int:job_id>/lpe-batch", methods=["POST"])
-def api_lpe_batch(job_id: int):
-    days = int(request.args.get("days", 7))
-    count = run_lpe_batch_for_job(job_id, days)
-    return app.response_class(response=json.dumps({"urls_processed": count}), mimetype="application/json")
+@_query_args(days=(_days, 7))
+def api_lpe_batch(job_id: int, days: int):
+    from services.lpe_service import run_lpe_batch_for_job
+    task_id = tasks.submit("lpe_batch", run_lpe_batch_for_job, job_id, days, job_id=job_id)
+    return _json({"task_id": task_id}, 202)
 
 
 @app.route("/api/research/<int:job_id>/watchlist", methods=["GET", "POST"])
 def api_watchlist(job_id: int):
+    from services.creative_threat_service import add_to_watchlist, list_watchlist
     if request.method == "POST":
-        data = request.get_json(silent=True) or {}
-        domain = (request.form.get("advertiser_domain") or data.get("advertiser_domain") or "").strip()
-        region = request.form.get("region") or data.get("region") or "US"
+        data = _body()
+        domain = (data.get("advertiser_domain") or "").strip()
+        region = data.get("region") or "US"
         if domain:
             add_to_watchlist(job_id, domain, region)
-        return app.response_class(response=json.dumps({"ok": True}), mimetype="application/json")
+        return app.response_class(_OK_JSON, mimetype="application/json")
     out = list_watchlist(job_id)
-    return app.response_class(response=json.dumps({"watchlist": [dict(w) for w in out]}), mimetype="application/json")
+    return _json({"watchlist": out})
 
 
 @app.route("/api/research/<int:job_id>/creative-alerts")
 def api_creative_alerts(job_id: int):
-    with cursor() as cur:
+    with read_cursor() as cur:
         cur.execute(
             """SELECT ca.id, ca.watchlist_id, ca.type, ca.previous_snapshot_id, ca.new_snapshot_id, ca.diff_summary_json, ca.created_at, cw.advertiser_domain
             FROM creative_alerts ca JOIN competitor_watchlist cw ON ca.watchlist_id = cw.id WHERE cw.job_id = ? ORDER BY ca.created_at DESC LIMIT 100""",
             (job_id,),
         )
-        rows = cur.fetchall()
-    return app.response_class(response=json.dumps({"alerts": [dict(r) for r in rows]}), mimetype="application/json")
+        cols = [d[0] for d in cur.description]
+        alerts = [dict(zip(cols, r)) for r in cur.fetchall()]
+    return _json({"alerts": alerts})
 
 
 @app.route("/api/research/<int:job_id>/target/<int:target_id>/budget-tracking", methods=["POST"])
 def api_toggle_budget_tracking(job_id: int, target_id: int):
     target = get_target(target_id)
     if not target or target["job_id"] != job_id:
-        return json.dumps({"error": "Not found"}), 404, {"Content-Type": "application/json"}
-    enabled = (request.get_json(silent=True) or {}).get("enabled", True) if request.is_json else request.form.get("enabled", "1") == "1"
+        return _json({"error": "Not found"}, 404)
+    data = _body()
+    enabled = data.get("enabled", True) if g.wants_json else data.get("enabled", "1") == "1"
     with cursor() as cur:
         cur.execute("UPDATE targets SET budget_tracking_enabled = ? WHERE id = ?", (1 if enabled else 0, target_id))
-    return app.response_class(response=json.dumps({"ok": True, "budget_tracking_enabled": enabled}), mimetype="application/json")
+    return _json({"ok": True, "budget_tracking_enabled": enabled})
 
 
 @app.route("/api/research/<int:job_id>/target/<int:target_id>/presence")
 def api_presence(job_id: int, target_id: int):
+    from services.budget_exhaustion_service import get_presence_24h
     target = get_target(target_id)
     if not target or target["job_id"] != job_id:
-        return json.dumps({"error": "Not found"}), 404, {"Content-Type": "application/json"}
+        return _json({"error": "Not found"}, 404)
     out = get_presence_24h(target_id)
-    return app.response_class(response=json.dumps({"presence": out}), mimetype="application/json")
+    return _json({"presence": out})
 
 
 @app.route("/api/research/<int:job_id>/target/<int:target_id>/presence-refresh", methods=["POST"])
 def api_presence_refresh(job_id: int, target_id: int):
     """Run one presence snapshot for this target (must have budget tracking enabled), then return updated presence."""
+    from services.budget_exhaustion_service import get_presence_24h, run_budget_tracking_for_target
     target = get_target(target_id)
     if not target or target["job_id"] != job_id:
-        return json.dumps({"error": "Not found"}), 404, {"Content-Type": "application/json"}
+        return _json({"error": "Not found"}, 404)
     ran = run_budget_tracking_for_target(target_id)
     out = get_presence_24h(target_id)
-    return app.response_class(
-        response=json.dumps({"ok": True, "ran": ran, "presence": out}),
-        mimetype="application/json",
-    )
+    return _json({"ok": True, "ran": ran, "presence": out})
 
 
 @app.route("/research/<int:job_id>/brand")
 def brand_monitor_page(job_id: int):
+    from services.brand_service import list_brand_assets_for_job, list_violations
     job = get_job(job_id)
     if not job:
         return "Project not found", 404
     status_filter = request.args.get("status", "")
-    assets = list_brand_assets(job_id) + list_brand_assets(None)
+    assets = list_brand_assets_for_job(job_id)
     violations = list_violations(job_id, status_filter if status_filter else None)
     return render_template("brand_monitor.html", job=job, assets=assets, violations=violations, status_filter=status_filter, title=f"Brand monitor - {job['name']}")
 
@@ -453,9 +671,12 @@ def creative_alerts_page(job_id: int):
 
 
 if __name__ == "__main__":
+    from services.budget_exhaustion_service import run_budget_tracking_cycle
+    from services.creative_threat_service import poll_watchlist_and_alert
+
     try:
-        scheduler.add_job(poll_watchlist_and_alert, "cron", hour=2, minute=0)
-        scheduler.add_job(run_budget_tracking_cycle, "interval", hours=1)
+        scheduler.add_job(poll_watchlist_and_alert, "cron", hour=2, minute=0, id="poll_watchlist", replace_existing=True)
+        scheduler.add_job(run_budget_tracking_cycle, "interval", hours=1, id="budget_tracking", replace_existing=True)
     except Exception as e:
         logger.warning("Scheduler jobs not added: %s", e)
     scheduler.start()
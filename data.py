@@ -1,21 +1,36 @@
 """Data access helpers for jobs, targets, ads, aggregates."""
-import json
+import functools
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 
-from db import cursor, utc_now
+import orjson
+
+from db import cursor, read_cursor, utc_now
+from utils import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# get_competitors results, keyed by filters + the job's latest snapshot time (new runs change the key).
+_competitors_cache = TTLCache(maxsize=128, ttl=3600)
+# get_competitor_aggregates results, same keying with the advertiser added.
+_aggregates_cache = TTLCache(maxsize=512, ttl=3600)
+# Project list for the index page; create/delete clear it, the TTL covers other worker processes.
+_jobs_cache = TTLCache(maxsize=1, ttl=5)
+
 
 def list_jobs():
-    with cursor() as cur:
-        cur.execute("SELECT id, name, created_at FROM jobs ORDER BY id DESC")
-        return [dict(r) for r in cur.fetchall()]
+    jobs = _jobs_cache.get("jobs")
+    if jobs is None:
+        with read_cursor() as cur:
+            cur.execute("SELECT id, name, created_at FROM jobs ORDER BY id DESC")
+            jobs = [dict(r) for r in cur.fetchall()]
+        _jobs_cache.set("jobs", jobs)
+    return jobs
 
 
 def get_job(job_id: int):
-    with cursor() as cur:
+    with read_cursor() as cur:
         cur.execute("SELECT id, name, created_at FROM jobs WHERE id = ?", (job_id,))
         r = cur.fetchone()
         return dict(r) if r else None
@@ -24,18 +39,22 @@ def get_job(job_id: int):
 def create_job(name: str):
     with cursor() as cur:
         cur.execute("INSERT INTO jobs (name) VALUES (?)", (name,))
-        return cur.lastrowid
+        job_id = cur.lastrowid
+    _jobs_cache.clear()
+    return job_id
 
 
 def delete_job(job_id: int) -> bool:
     """Delete a job and all related data (targets, snapshots, ads, etc. via FK CASCADE). Returns True if deleted."""
     with cursor() as cur:
         cur.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
-        return cur.rowcount > 0
+        deleted = cur.rowcount > 0
+    _jobs_cache.clear()
+    return deleted
 
 
 def list_targets(job_id: int):
-    with cursor() as cur:
+    with read_cursor() as cur:
         cur.execute(
             """SELECT id, job_id, keyword, location_input, serp_location, gl, hl, created_at, budget_tracking_enabled
             FROM targets WHERE job_id = ? ORDER BY id""",
@@ -46,22 +65,19 @@ def list_targets(job_id: int):
 
 def get_targets_with_last_run(job_id: int):
     """List targets with last_snapshot_utc (max captured_at_utc for that target)."""
-    targets = list_targets(job_id)
-    with cursor() as cur:
+    # Correlated MAX per target: one index seek on idx_snapshots_target_time each, no join over all snapshots.
+    with read_cursor() as cur:
         cur.execute(
-            """SELECT t.id, MAX(s.captured_at_utc) AS last_snapshot_utc
-            FROM targets t LEFT JOIN serp_snapshots s ON s.target_id = t.id WHERE t.job_id = ?
-            GROUP BY t.id""",
+            """SELECT id, job_id, keyword, location_input, serp_location, gl, hl, created_at, budget_tracking_enabled,
+            (SELECT MAX(captured_at_utc) FROM serp_snapshots s WHERE s.target_id = t.id) AS last_snapshot_utc
+            FROM targets t WHERE job_id = ? ORDER BY id""",
             (job_id,),
         )
-        by_id = {r["id"]: r["last_snapshot_utc"] for r in cur.fetchall()}
-    for t in targets:
-        t["last_snapshot_utc"] = by_id.get(t["id"])
-    return targets
+        return [dict(r) for r in cur.fetchall()]
 
 
 def get_target(target_id: int):
-    with cursor() as cur:
+    with read_cursor() as cur:
         cur.execute("SELECT * FROM targets WHERE id = ?", (target_id,))
         r = cur.fetchone()
         return dict(r) if r else None
@@ -69,254 +85,243 @@ def get_target(target_id: int):
 
 def add_targets(job_id: int, keywords: list, location_input: str, gl: str, hl: str):
     """Insert multiple targets. serp_location set same as location_input for now. Returns count inserted."""
-    inserted = 0
+    gl, hl = gl or "us", hl or "en"
+    rows = [(job_id, kw, location_input, location_input, gl, hl) for kw in ((k or "").strip() for k in keywords) if kw]
+    if not rows:
+        return 0
     with cursor() as cur:
-        for kw in keywords:
-            kw = (kw or "").strip()
-            if not kw:
-                continue
-            cur.execute(
-                """INSERT INTO targets (job_id, keyword, location_input, serp_location, gl, hl)
-                VALUES (?,?,?,?,?,?)""",
-                (job_id, kw, location_input, location_input, gl or "us", hl or "en"),
-            )
-            inserted += 1
-    return inserted
+        cur.executemany(
+            """INSERT INTO targets (job_id, keyword, location_input, serp_location, gl, hl)
+            VALUES (?,?,?,?,?,?)""",
+            rows,
+        )
+    return len(rows)
+
+
+def get_synced_at(job_id: int):
+    """Latest snapshot time for the job (or None)."""
+    # Ads only arrive with a snapshot, so this doubles as the cache token for the analytics caches.
+    # Kept current by the serp_snapshots insert trigger (see db.init_db).
+    with read_cursor() as cur:
+        cur.execute("SELECT last_sync_utc FROM jobs WHERE id = ?", (job_id,))
+        r = cur.fetchone()
+    return r[0] if r and r[0] else None
 
 
 def _parse_cutoff(days: int):
     return (datetime.now(timezone.utc) - timedelta(days=int(days))).strftime("%Y-%m-%d")
 
 
+# One pass over the ad_counts_daily rollup for get_competitors: the filtered window (days/device) feeds the
+# competitor rows, the last 14 days (all devices) feed the diffs. All windows start on a day boundary, so
+# day-level counts give the same totals as scanning ads.
+_COMPETITORS_SQL = """SELECT advertiser,
+    SUM(CASE WHEN in_window THEN cnt ELSE 0 END) AS appearances,
+    SUM(CASE WHEN in_window AND block = 'top' THEN cnt ELSE 0 END) * 1.0 / NULLIF(SUM(CASE WHEN in_window THEN cnt ELSE 0 END), 0) AS top_ads_share,
+    SUM(CASE WHEN in_window AND block = 'bottom' THEN cnt ELSE 0 END) * 1.0 / NULLIF(SUM(CASE WHEN in_window THEN cnt ELSE 0 END), 0) AS bottom_ads_share,
+    MAX(day = :today AND cnt > 0) AS seen_today,
+    MAX(day = :yesterday AND cnt > 0) AS seen_yesterday,
+    SUM(CASE WHEN day >= :week_ago THEN cnt ELSE 0 END) AS this_week,
+    SUM(CASE WHEN day >= :two_weeks_ago AND day < :week_ago THEN cnt ELSE 0 END) AS last_week
+    FROM (
+        SELECT advertiser, block, day, cnt,
+        day >= :cutoff AND (:device = 'all' OR device = :device) AS in_window
+        FROM ad_counts_daily WHERE job_id = :job_id AND day >= MIN(:cutoff, :two_weeks_ago)
+    )
+    GROUP BY advertiser ORDER BY appearances DESC, advertiser"""
+
+
 def get_competitors(job_id: int, days: int, device: str):
     """Return list of {advertiser, appearances, top_ads_share, bottom_ads_share} and synced_at_utc, diffs."""
-    cutoff = _parse_cutoff(days)
-    with cursor() as cur:
-        if device == "all":
-            cur.execute(
-                """SELECT advertiser,
-                COUNT(*) AS appearances,
-                SUM(CASE WHEN block = 'top' THEN 1 ELSE 0 END) * 1.0 / NULLIF(COUNT(*), 0) AS top_ads_share,
-                SUM(CASE WHEN block = 'bottom' THEN 1 ELSE 0 END) * 1.0 / NULLIF(COUNT(*), 0) AS bottom_ads_share
-                FROM ads WHERE job_id = ? AND created_at_utc >= ?
-                GROUP BY advertiser ORDER BY appearances DESC""",
-                (job_id, cutoff),
-            )
-        else:
-            cur.execute(
-                """SELECT advertiser,
-                COUNT(*) AS appearances,
-                SUM(CASE WHEN block = 'top' THEN 1 ELSE 0 END) * 1.0 / NULLIF(COUNT(*), 0) AS top_ads_share,
-                SUM(CASE WHEN block = 'bottom' THEN 1 ELSE 0 END) * 1.0 / NULLIF(COUNT(*), 0) AS bottom_ads_share
-                FROM ads WHERE job_id = ? AND created_at_utc >= ? AND device = ?
-                GROUP BY advertiser ORDER BY appearances DESC""",
-                (job_id, cutoff, device),
-            )
-        rows = cur.fetchall()
-    competitors = [dict(r) for r in rows]
-    # Latest snapshot time as synced_at
-    with cursor() as cur:
-        cur.execute(
-            """SELECT MAX(captured_at_utc) FROM serp_snapshots s
-            JOIN targets t ON s.target_id = t.id WHERE t.job_id = ?""",
-            (job_id,),
-        )
-        r = cur.fetchone()
-    synced = r[0] if r and r[0] else None
-    # Simple diffs: new today vs yesterday, increased this week (placeholder)
-    today = datetime.now(timezone.utc).date().isoformat()
-    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).date().isoformat()
-    with cursor() as cur:
-        cur.execute(
-            """SELECT advertiser FROM ads WHERE job_id = ? AND date(created_at_utc) = ?
-            GROUP BY advertiser""",
-            (job_id, today),
-        )
-        today_advertisers = {row[0] for row in cur.fetchall()}
+    synced = get_synced_at(job_id)
+    # Windows are whole days, so the result is stable until a new snapshot lands or the date rolls over.
+    key = (job_id, int(days), device, synced, datetime.now(timezone.utc).date())
+    hit = _competitors_cache.get(key)
+    if hit is not None:
+        return hit
+    now = datetime.now(timezone.utc)
+    with read_cursor() as cur:
         cur.execute(
-            """SELECT advertiser FROM ads WHERE job_id = ? AND date(created_at_utc) = ?
-            GROUP BY advertiser""",
-            (job_id, yesterday),
+            _COMPETITORS_SQL,
+            {
+                "job_id": job_id,
+                "cutoff": _parse_cutoff(days),
+                "device": device,
+                "today": now.date().isoformat(),
+                "yesterday": (now - timedelta(days=1)).date().isoformat(),
+                "week_ago": (now - timedelta(days=7)).strftime("%Y-%m-%d"),
+                "two_weeks_ago": (now - timedelta(days=14)).strftime("%Y-%m-%d"),
+            },
         )
-        yesterday_advertisers = {row[0] for row in cur.fetchall()}
-    new_today = list(today_advertisers - yesterday_advertisers)[:12]
-    week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).strftime("%Y-%m-%d")
-    with cursor() as cur:
-        cur.execute(
-            """SELECT advertiser, COUNT(*) AS cnt FROM ads
-            WHERE job_id = ? AND created_at_utc >= ? GROUP BY advertiser""",
-            (job_id, week_ago),
-        )
-        this_week = {row[0]: row[1] for row in cur.fetchall()}
-        cur.execute(
-            """SELECT advertiser, COUNT(*) AS cnt FROM ads
-            WHERE job_id = ? AND created_at_utc < ? AND created_at_utc >= ?
-            GROUP BY advertiser""",
-            (job_id, week_ago, (datetime.now(timezone.utc) - timedelta(days=14)).strftime("%Y-%m-%d")),
-        )
-        last_week = {row[0]: row[1] for row in cur.fetchall()}
+        buckets = cur.fetchall()
+    competitors = [
+        {"advertiser": r["advertiser"], "appearances": r["appearances"], "top_ads_share": r["top_ads_share"], "bottom_ads_share": r["bottom_ads_share"]}
+        for r in buckets
+        if r["appearances"]
+    ]
+    # Simple diffs: new today vs yesterday, increased this week (placeholder).
+    # Rows arrive by appearances; name order keeps the diff cut-offs and ties stable.
+    new_today = sorted(r["advertiser"] for r in buckets if r["seen_today"] and not r["seen_yesterday"])[:12]
+    this_week = {r["advertiser"]: r["this_week"] for r in buckets if r["this_week"]}
+    last_week = {r["advertiser"]: r["last_week"] for r in buckets if r["last_week"]}
     increased = [{"advertiser": a, "delta": this_week.get(a, 0) - last_week.get(a, 0)} for a in this_week if this_week.get(a, 0) > last_week.get(a, 0)]
-    increased.sort(key=lambda x: -x["delta"])
+    increased.sort(key=lambda x: (-x["delta"], x["advertiser"]))
     diffs = {"new_today": new_today, "increased_this_week": increased[:8]}
-    return {"competitors": competitors, "synced_at_utc": synced, "diffs": diffs}
+    out = {"competitors": competitors, "synced_at_utc": synced, "diffs": diffs}
+    _competitors_cache.set(key, out)
+    return out
 
 
-def get_competitor_ads(job_id: int, advertiser: str, days: int, device: str, offer_tag: str = None):
-    """Return ads list and synced_at for competitor drilldown."""
-    cutoff = _parse_cutoff(days)
-    with cursor() as cur:
-        if device == "all":
-            if offer_tag:
-                cur.execute(
-                    """SELECT id, advertiser, ad_id, device, block, headline, description, displayed_link,
-                    destination_link, position, created_at_utc, extensions_json, offers_json, offer_tag
-                    FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ? AND (offer_tag = ? OR offer_tag IS NULL)
-                    ORDER BY created_at_utc DESC LIMIT 500""",
-                    (job_id, advertiser, cutoff, offer_tag),
-                )
-            else:
-                cur.execute(
-                    """SELECT id, advertiser, ad_id, device, block, headline, description, displayed_link,
-                    destination_link, position, created_at_utc, extensions_json, offers_json, offer_tag
-                    FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ?
-                    ORDER BY created_at_utc DESC LIMIT 500""",
-                    (job_id, advertiser, cutoff),
-                )
-        else:
-            if offer_tag:
-                cur.execute(
-                    """SELECT id, advertiser, ad_id, device, block, headline, description, displayed_link,
-                    destination_link, position, created_at_utc, extensions_json, offers_json, offer_tag
-                    FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ? AND device = ? AND (offer_tag = ? OR offer_tag IS NULL)
-                    ORDER BY created_at_utc DESC LIMIT 500""",
-                    (job_id, advertiser, cutoff, device, offer_tag),
-                )
-            else:
-                cur.execute(
-                    """SELECT id, advertiser, ad_id, device, block, headline, description, displayed_link,
-                    destination_link, position, created_at_utc, extensions_json, offers_json, offer_tag
-                    FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ? AND device = ?
-                    ORDER BY created_at_utc DESC LIMIT 500""",
-                    (job_id, advertiser, cutoff, device),
-                )
-        rows = cur.fetchall()
-    ads_list = []
-    for r in rows:
-        d = dict(r)
-        d["offers"] = json.loads(r["offers_json"]) if r["offers_json"] else []
-        d["extensions"] = json.loads(r["extensions_json"]) if r["extensions_json"] else None
-        ads_list.append(d)
-    with cursor() as cur:
-        cur.execute(
-            """SELECT MAX(captured_at_utc) FROM serp_snapshots s
-            JOIN targets t ON s.target_id = t.id WHERE t.job_id = ?""",
-            (job_id,),
-        )
-        row = cur.fetchone()
-        synced = row[0] if row and row[0] else None
-    return {"ads": ads_list, "synced_at_utc": synced}
+def list_top_advertisers(job_id: int, days: int, device: str, limit: int = 100):
+    """Advertiser names by appearances (most first); the top-N cut happens in SQL."""
+    # Doesn't depend on the selected advertiser, so geo-page toggles reuse it; the 5-minute bucket refreshes it.
+    return list(_top_advertisers(job_id, int(days), device, limit, int(time.time() // 300)))
 
 
-def get_competitor_aggregates(job_id: int, advertiser: str, days: int, device: str):
-    """Total, top_share, bottom_share, dayweek (today, this_week), monthly_spend, spend_scenario, series points, offer_tags."""
+@functools.lru_cache(maxsize=512)
+def _top_advertisers(job_id: int, days: int, device: str, limit: int, _bucket: int) -> tuple:
     cutoff = _parse_cutoff(days)
-    with cursor() as cur:
-        if device == "all":
-            cur.execute(
-                """SELECT COUNT(*) AS total,
-                SUM(CASE WHEN block = 'top' THEN 1.0 ELSE 0 END) / NULLIF(COUNT(*), 0) AS top_share,
-                SUM(CASE WHEN block = 'bottom' THEN 1.0 ELSE 0 END) / NULLIF(COUNT(*), 0) AS bottom_share
-                FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ?""",
-                (job_id, advertiser, cutoff),
-            )
-        else:
-            cur.execute(
-                """SELECT COUNT(*) AS total,
-                SUM(CASE WHEN block = 'top' THEN 1.0 ELSE 0 END) / NULLIF(COUNT(*), 0) AS top_share,
-                SUM(CASE WHEN block = 'bottom' THEN 1.0 ELSE 0 END) / NULLIF(COUNT(*), 0) AS bottom_share
-                FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ? AND device = ?""",
-                (job_id, advertiser, cutoff, device),
-            )
-        row = cur.fetchone()
-    total = row["total"] or 0
-    top_share = row["top_share"] or 0.0
-    bottom_share = row["bottom_share"] or 0.0
-    today_str = datetime.now(timezone.utc).date().isoformat()
-    week_start = (datetime.now(timezone.utc) - timedelta(days=7)).strftime("%Y-%m-%d")
-    with cursor() as cur:
-        cur.execute(
-            """SELECT COUNT(*) FROM ads WHERE job_id = ? AND advertiser = ? AND date(created_at_utc) = ?""",
-            (job_id, advertiser, today_str),
-        )
-        dayweek_today = cur.fetchone()[0] or 0
-        cur.execute(
-            """SELECT COUNT(*) FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ?""",
-            (job_id, advertiser, week_start),
-        )
-        dayweek_week = cur.fetchone()[0] or 0
-    dayweek = {"today": dayweek_today, "this_week": dayweek_week}
-    cpc = 5.0
-    clicks_per = 0.5
-    monthly_spend = int(total * cpc * clicks_per * 30 / max(days, 1))
-    spend_scenario = {"cpc_assumption": cpc, "clicks_per_appearance": clicks_per}
-    # Series by date
-    with cursor() as cur:
+    with read_cursor() as cur:
         if device == "all":
             cur.execute(
-                """SELECT date(created_at_utc) AS d,
-                COUNT(*) AS appearances,
-                SUM(CASE WHEN block = 'top' THEN 1 ELSE 0 END) AS top,
-                SUM(CASE WHEN block = 'bottom' THEN 1 ELSE 0 END) AS bottom
-                FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ?
-                GROUP BY date(created_at_utc) ORDER BY d""",
-                (job_id, advertiser, cutoff),
+                """SELECT advertiser FROM ads WHERE job_id = ? AND created_at_utc >= ?
+                GROUP BY advertiser ORDER BY COUNT(*) DESC LIMIT ?""",
+                (job_id, cutoff, limit),
             )
         else:
             cur.execute(
-                """SELECT date(created_at_utc) AS d,
-                COUNT(*) AS appearances,
-                SUM(CASE WHEN block = 'top' THEN 1 ELSE 0 END) AS top,
-                SUM(CASE WHEN block = 'bottom' THEN 1 ELSE 0 END) AS bottom
-                FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ? AND device = ?
-                GROUP BY date(created_at_utc) ORDER BY d""",
-                (job_id, advertiser, cutoff, device),
+                """SELECT advertiser FROM ads WHERE job_id = ? AND created_at_utc >= ? AND device = ?
+                GROUP BY advertiser ORDER BY COUNT(*) DESC LIMIT ?""",
+                (job_id, cutoff, device, limit),
             )
-        rows = cur.fetchall()
-    series_points = [{"date": row["d"], "appearances": row["appearances"], "top": row["top"] or 0, "bottom": row["bottom"] or 0} for row in rows]
-    if not series_points:
-        series_points = [{"date": cutoff, "appearances": 0, "top": 0, "bottom": 0}]
-    # Offer tags from same ads
-    with cursor() as cur:
-        cur.execute(
-            """SELECT DISTINCT offer_tag FROM ads WHERE job_id = ? AND advertiser = ? AND created_at_utc >= ? AND offer_tag IS NOT NULL AND offer_tag != ''""",
-            (job_id, advertiser, cutoff),
-        )
-        offer_tags = [r[0] for r in cur.fetchall()]
-    synced_at = None
-    with cursor() as cur:
+        return tuple(r[0] for r in cur.fetchall())
+
+
+# Drilldown SQL: absent filters are bound as NULL, so every call shares one prepared statement.
+_COMPETITOR_ADS_SQL = """SELECT id, advertiser, ad_id, device, block, headline, description, displayed_link,
+    destination_link, position, created_at_utc, extensions_json, offers_json, offer_tag
+    FROM ads WHERE job_id = :job_id AND advertiser = :advertiser AND created_at_utc >= :cutoff
+    AND (:device IS NULL OR device = :device)
+    AND (:offer_tag IS NULL OR offer_tag = :offer_tag OR offer_tag IS NULL)
+    ORDER BY created_at_utc DESC LIMIT 500"""
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_json(raw: str):
+    # An advertiser's ads mostly repeat the same offers/extensions payloads; results are shared, treat as read-only.
+    return orjson.loads(raw)
+
+
+def iter_competitor_ads(job_id: int, advertiser: str, days: int, device: str, offer_tag: str = None):
+    """Yield the competitor drilldown ads (newest first, at most 500) one dict at a time."""
+    params = {
+        "job_id": job_id,
+        "advertiser": advertiser,
+        "cutoff": _parse_cutoff(days),
+        "device": None if device == "all" else device,
+        "offer_tag": offer_tag or None,
+    }
+    with read_cursor() as cur:
+        cur.execute(_COMPETITOR_ADS_SQL, params)
+        cur.arraysize = 100
+        while True:
+            rows = cur.fetchmany()
+            if not rows:
+                break
+            for r in rows:
+                d = dict(r)
+                d["offers"] = _parse_json(r["offers_json"]) if r["offers_json"] else []
+                d["extensions"] = _parse_json(r["extensions_json"]) if r["extensions_json"] else None
+                yield d
+
+
+# Spend estimate assumptions (shown alongside the estimate as spend_scenario).
+CPC_ASSUMPTION = 5.0
+CLICKS_PER_APPEARANCE = 0.5
+
+# Scalars for get_competitor_summary in one scan: totals/shares/spend follow the days/device window, dayweek
+# counts the last 7 days and offer tags the days window (both across devices), so the scan covers the wider range.
+_SUMMARY_SQL = """SELECT SUM(in_window) AS total,
+    SUM(CASE WHEN in_window AND block = 'top' THEN 1.0 ELSE 0 END) / NULLIF(SUM(in_window), 0) AS top_share,
+    SUM(CASE WHEN in_window AND block = 'bottom' THEN 1.0 ELSE 0 END) / NULLIF(SUM(in_window), 0) AS bottom_share,
+    CAST(SUM(in_window) * :cpc * :clicks_per * 30 / :spend_days AS INTEGER) AS monthly_spend,
+    SUM(created_day = :today) AS dayweek_today,
+    SUM(created_at_utc >= :week_start) AS dayweek_week,
+    json_group_array(DISTINCT offer_tag) FILTER (WHERE created_at_utc >= :cutoff AND offer_tag != '') AS offer_tags
+    FROM (
+        SELECT block, offer_tag, created_at_utc, created_day,
+        created_at_utc >= :cutoff AND (:device = 'all' OR device = :device) AS in_window
+        FROM ads WHERE job_id = :job_id AND advertiser = :advertiser AND created_at_utc >= MIN(:cutoff, :week_start)
+    )"""
+
+# Daily series assembled as one JSON array in SQLite rather than a Row per day.
+_SERIES_SQL = """SELECT json_group_array(json_object('date', d, 'appearances', appearances, 'top', top, 'bottom', bottom))
+    FROM (
+        SELECT created_day AS d,
+        COUNT(*) AS appearances,
+        SUM(CASE WHEN block = 'top' THEN 1 ELSE 0 END) AS top,
+        SUM(CASE WHEN block = 'bottom' THEN 1 ELSE 0 END) AS bottom
+        FROM ads WHERE job_id = :job_id AND advertiser = :advertiser AND created_day >= :cutoff
+        AND (:device = 'all' OR device = :device)
+        GROUP BY created_day ORDER BY d
+    )"""
+
+
+def get_competitor_summary(job_id: int, advertiser: str, days: int, device: str):
+    """Total, top_share, bottom_share, dayweek (today, this_week), monthly_spend, spend_scenario, offer_tags, synced_at_utc."""
+    now = datetime.now(timezone.utc)
+    with read_cursor() as cur:
         cur.execute(
-            """SELECT MAX(captured_at_utc) FROM serp_snapshots s JOIN targets t ON s.target_id = t.id WHERE t.job_id = ?""",
-            (job_id,),
+            _SUMMARY_SQL,
+            {
+                "job_id": job_id,
+                "advertiser": advertiser,
+                "cutoff": _parse_cutoff(days),
+                "device": device,
+                "today": now.date().isoformat(),
+                "week_start": (now - timedelta(days=7)).strftime("%Y-%m-%d"),
+                "cpc": CPC_ASSUMPTION,
+                "clicks_per": CLICKS_PER_APPEARANCE,
+                "spend_days": max(days, 1),
+            },
         )
-        r = cur.fetchone()
-        if r and r[0]:
-            synced_at = r[0]
+        row = cur.fetchone()
     return {
-        "total": total,
-        "top_share": top_share,
-        "bottom_share": bottom_share,
-        "dayweek": dayweek,
-        "monthly_spend": monthly_spend,
-        "spend_scenario": spend_scenario,
-        "series": {"points": series_points},
-        "offer_tags": offer_tags or [],
-        "synced_at_utc": synced_at,
+        "total": row["total"] or 0,
+        "top_share": row["top_share"] or 0.0,
+        "bottom_share": row["bottom_share"] or 0.0,
+        "dayweek": {"today": row["dayweek_today"] or 0, "this_week": row["dayweek_week"] or 0},
+        "monthly_spend": row["monthly_spend"] or 0,
+        "spend_scenario": {"cpc_assumption": CPC_ASSUMPTION, "clicks_per_appearance": CLICKS_PER_APPEARANCE},
+        "offer_tags": orjson.loads(row["offer_tags"]),
+        "synced_at_utc": get_synced_at(job_id),
     }
 
 
+def get_competitor_series(job_id: int, advertiser: str, days: int, device: str):
+    """Daily {date, appearances, top, bottom} points for the chart (one zero point when there is no data)."""
+    cutoff = _parse_cutoff(days)
+    with read_cursor() as cur:
+        cur.execute(_SERIES_SQL, {"job_id": job_id, "advertiser": advertiser, "cutoff": cutoff, "device": device})
+        points = orjson.loads(cur.fetchone()[0])
+    return {"points": points or [{"date": cutoff, "appearances": 0, "top": 0, "bottom": 0}]}
+
+
+def get_competitor_aggregates(job_id: int, advertiser: str, days: int, device: str):
+    """get_competitor_summary plus the daily series, for the competitor and geo pages."""
+    key = (job_id, advertiser, int(days), device, get_synced_at(job_id), datetime.now(timezone.utc).date())
+    hit = _aggregates_cache.get(key)
+    if hit is not None:
+        return hit
+    out = get_competitor_summary(job_id, advertiser, days, device)
+    out["series"] = get_competitor_series(job_id, advertiser, days, device)
+    _aggregates_cache.set(key, out)
+    return out
+
+
 def get_ad_by_id(ad_id: int):
     """Get single ad row by id for crawl."""
-    with cursor() as cur:
+    with read_cursor() as cur:
         cur.execute("SELECT id, destination_link FROM ads WHERE id = ?", (ad_id,))
         r = cur.fetchone()
         return dict(r) if r else None
@@ -326,28 +331,26 @@ def get_ad_by_id_or_external(ad_id_or_pk):
     """Resolve ad by primary key (int) or external ad_id (str). Returns row with id, destination_link."""
     try:
         pk = int(ad_id_or_pk)
-        with cursor() as cur:
+        with read_cursor() as cur:
             cur.execute("SELECT id, destination_link FROM ads WHERE id = ?", (pk,))
             r = cur.fetchone()
             return dict(r) if r else None
     except (ValueError, TypeError):
         pass
-    with cursor() as cur:
+    # Prefer the latest sighting that has a landing URL, else the latest one at all.
+    with read_cursor() as cur:
         cur.execute(
-            "SELECT id, destination_link FROM ads WHERE ad_id = ? AND destination_link IS NOT NULL AND destination_link != '' ORDER BY created_at_utc DESC LIMIT 1",
+            """SELECT id, destination_link FROM ads WHERE ad_id = ?
+            ORDER BY COALESCE(destination_link, '') != '' DESC, created_at_utc DESC LIMIT 1""",
             (str(ad_id_or_pk),),
         )
         r = cur.fetchone()
-        if r:
-            return dict(r)
-        cur.execute("SELECT id, destination_link FROM ads WHERE ad_id = ? ORDER BY created_at_utc DESC LIMIT 1", (str(ad_id_or_pk),))
-        r = cur.fetchone()
         return dict(r) if r else None
 
 
 def get_latest_crawl(ad_id: int):
     """Get latest crawl for an ad (by ads.id)."""
-    with cursor() as cur:
+    with read_cursor() as cur:
         cur.execute(
             """SELECT final_url, http_status, title, h1, h2s_json, has_form, pricing_mentions, financing_mentions,
             offers_json, pagespeed_performance, pagespeed_accessibility, pagespeed_best_practices, pagespeed_seo, synced_at_utc
@@ -1,7 +1,11 @@
 """Database layer: SQLite schema and connection helpers."""
+import atexit
 import json
 import logging
+import os
+import queue
 import sqlite3
+import threading
 from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
@@ -16,35 +20,116 @@ Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
 
 def get_connection():
     """Return a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
+    # check_same_thread=False: connections are used from background task and scheduler threads.
+    # cached_statements: pooled connections see every query in the app; keep them all prepared (default is 128).
+    conn = sqlite3.connect(DB_PATH, timeout=30.0, check_same_thread=False, cached_statements=256)
     conn.execute("PRAGMA foreign_keys = ON")
+    # Per-connection tuning; WAL itself is persistent and set once in init_db().
+    conn.execute("PRAGMA busy_timeout = 30000")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -64000")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 268435456")
     conn.row_factory = sqlite3.Row
     return conn
 
 
+# Connections are reused instead of opened per call (keeps the page cache warm and skips connect + PRAGMAs).
+# Writers still go through SQLite's own locking (WAL + busy_timeout), which also covers other processes.
+POOL_SIZE = 8
+_pools = {}
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _pool(kind: str) -> queue.LifoQueue:
+    global _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            # Never reuse connections inherited across fork (gunicorn --preload, process pools).
+            _pools.clear()
+            _pool_pid = os.getpid()
+        q = _pools.get(kind)
+        if q is None:
+            q = _pools[kind] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return q
+
+
+def _acquire(kind: str):
+    try:
+        return _pool(kind).get_nowait()
+    except queue.Empty:
+        conn = get_connection()
+        if kind == "read":
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+
+def _release(kind: str, conn) -> None:
+    try:
+        _pool(kind).put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+@atexit.register
+def close_pool() -> None:
+    """Close idle pooled connections (also lets SQLite checkpoint the WAL cleanly on shutdown)."""
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            return
+        pools = list(_pools.values())
+    for q in pools:
+        while True:
+            try:
+                q.get_nowait().close()
+            except queue.Empty:
+                break
+
+
 @contextmanager
 def cursor():
-    conn = get_connection()
+    conn = _acquire("write")
+    cur = conn.cursor()
     try:
-        cur = conn.cursor()
         yield cur
         conn.commit()
     except Exception:
         conn.rollback()
         raise
     finally:
-        conn.close()
+        cur.close()
+        _release("write", conn)
+
+
+@contextmanager
+def read_cursor():
+    """Cursor on a pooled read-only (query_only) connection; WAL lets these run alongside writers."""
+    conn = _acquire("read")
+    cur = conn.cursor()
+    try:
+        yield cur
+    finally:
+        cur.close()
+        if conn.in_transaction:
+            conn.rollback()
+        _release("read", conn)
 
 
 def init_db():
     """Create all tables if they do not exist."""
     with cursor() as cur:
+        # WAL lets readers (exports, dashboards) run while the scheduler writes (not available for :memory:).
+        if DB_PATH != ":memory:":
+            cur.execute("PRAGMA journal_mode = WAL")
+            cur.execute("PRAGMA wal_autocheckpoint = 1000")
         # Phase 1: Core
         cur.execute("""
             CREATE TABLE IF NOT EXISTS jobs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (datetime('now'))
+                created_at TEXT NOT NULL DEFAULT (datetime('now')),
+                last_sync_utc TEXT
             )
         """)
         cur.execute("""
@@ -60,16 +145,36 @@ def init_db():
                 budget_tracking_enabled INTEGER NOT NULL DEFAULT 0
             )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_targets_job ON targets(job_id)")
         cur.execute("""
             CREATE TABLE IF NOT EXISTS serp_snapshots (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 target_id INTEGER NOT NULL REFERENCES targets(id) ON DELETE CASCADE,
                 device TEXT NOT NULL,
                 captured_at_utc TEXT NOT NULL,
-                raw_json TEXT,
+                raw_json BLOB,
                 grid_cell_id INTEGER
             )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_target_time ON serp_snapshots(target_id, captured_at_utc)")
+        # jobs.last_sync_utc = latest snapshot time, maintained on insert so readers skip the MAX over snapshots.
+        cur.execute("PRAGMA table_info(jobs)")
+        if "last_sync_utc" not in {r["name"] for r in cur.fetchall()}:
+            cur.execute("ALTER TABLE jobs ADD COLUMN last_sync_utc TEXT")
+            cur.execute("""
+                UPDATE jobs SET last_sync_utc = (
+                    SELECT MAX(s.captured_at_utc) FROM serp_snapshots s
+                    JOIN targets t ON s.target_id = t.id WHERE t.job_id = jobs.id
+                )
+            """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_snapshots_job_sync AFTER INSERT ON serp_snapshots
+            BEGIN
+                UPDATE jobs SET last_sync_utc = NEW.captured_at_utc
+                WHERE id = (SELECT job_id FROM targets WHERE id = NEW.target_id)
+                AND (last_sync_utc IS NULL OR NEW.captured_at_utc > last_sync_utc);
+            END
+        """)
         cur.execute("""
             CREATE TABLE IF NOT EXISTS ads (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -87,11 +192,68 @@ def init_db():
                 created_at_utc TEXT NOT NULL,
                 extensions_json TEXT,
                 offers_json TEXT,
-                offer_tag TEXT
+                offer_tag TEXT,
+                created_day TEXT GENERATED ALWAYS AS (substr(created_at_utc, 1, 10)) VIRTUAL
             )
         """)
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_job_advertiser ON ads(job_id, advertiser)")
+        # Older databases predate created_day; VIRTUAL generated columns can be added in place.
+        cur.execute("PRAGMA table_xinfo(ads)")
+        if "created_day" not in {r["name"] for r in cur.fetchall()}:
+            cur.execute("ALTER TABLE ads ADD COLUMN created_day TEXT GENERATED ALWAYS AS (substr(created_at_utc, 1, 10)) VIRTUAL")
+        # Per-advertiser windows (aggregates, drilldown, share SUMs) are answered from this index alone;
+        # it also covers every (job_id, advertiser) lookup the old two-column index served.
+        cur.execute("DROP INDEX IF EXISTS idx_ads_job_advertiser")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_job_adv_created ON ads(job_id, advertiser, created_at_utc, block, device)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_job_device_created ON ads(job_id, device, created_at_utc)")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_created_at ON ads(created_at_utc)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_job_created ON ads(job_id, created_at_utc DESC)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_snapshot ON ads(snapshot_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_job_advertiser_day ON ads(job_id, advertiser, created_day)")
+        # Ad drilldown by SerpAPI's external ad id (latest first).
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ads_external ON ads(ad_id, created_at_utc)")
+        # LPE batch picks ads with a landing URL; the partial index holds only those rows and covers the query.
+        cur.execute(
+            """CREATE INDEX IF NOT EXISTS idx_ads_job_dest_link ON ads(job_id, created_at_utc, destination_link)
+            WHERE destination_link IS NOT NULL AND destination_link != ''"""
+        )
+        # Daily ad counts per (job, day, advertiser, device, block), kept in step with ads by triggers, so
+        # competitor rollups scan a few rows per advertiser-day instead of every ad. NULL device/block are stored
+        # as '' because WITHOUT ROWID primary keys are NOT NULL.
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ad_counts_daily'")
+        backfill = cur.fetchone() is None
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ad_counts_daily (
+                job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+                day TEXT NOT NULL,
+                advertiser TEXT NOT NULL,
+                device TEXT NOT NULL,
+                block TEXT NOT NULL,
+                cnt INTEGER NOT NULL,
+                PRIMARY KEY (job_id, day, advertiser, device, block)
+            ) WITHOUT ROWID
+        """)
+        if backfill:
+            cur.execute("""
+                INSERT INTO ad_counts_daily (job_id, day, advertiser, device, block, cnt)
+                SELECT job_id, created_day, advertiser, COALESCE(device, ''), COALESCE(block, ''), COUNT(*)
+                FROM ads GROUP BY 1, 2, 3, 4, 5
+            """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_ads_counts_insert AFTER INSERT ON ads
+            BEGIN
+                INSERT INTO ad_counts_daily (job_id, day, advertiser, device, block, cnt)
+                VALUES (NEW.job_id, substr(NEW.created_at_utc, 1, 10), NEW.advertiser, COALESCE(NEW.device, ''), COALESCE(NEW.block, ''), 1)
+                ON CONFLICT DO UPDATE SET cnt = cnt + 1;
+            END
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_ads_counts_delete AFTER DELETE ON ads
+            BEGIN
+                UPDATE ad_counts_daily SET cnt = cnt - 1
+                WHERE job_id = OLD.job_id AND day = substr(OLD.created_at_utc, 1, 10) AND advertiser = OLD.advertiser
+                AND device = COALESCE(OLD.device, '') AND block = COALESCE(OLD.block, '');
+            END
+        """)
         cur.execute("""
             CREATE TABLE IF NOT EXISTS crawls (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -113,15 +275,19 @@ def init_db():
                 synced_at_utc TEXT NOT NULL
             )
         """)
+        # Latest crawl per ad; also keeps the ON DELETE SET NULL from ads off a full scan.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_crawls_ad_time ON crawls(ad_id, synced_at_utc)")
         cur.execute("""
             CREATE TABLE IF NOT EXISTS atc_snapshots (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 advertiser TEXT NOT NULL,
                 region TEXT NOT NULL,
-                raw_json TEXT,
+                raw_json BLOB,
                 synced_at_utc TEXT NOT NULL
             )
         """)
+        # Latest snapshot per (advertiser, region) for the creative-threat diff.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_atc_snapshots_lookup ON atc_snapshots(advertiser, region, synced_at_utc)")
         # Time-series for LPE and presence (Phase 4, 8)
         cur.execute("""
             CREATE TABLE IF NOT EXISTS metrics (
@@ -170,6 +336,9 @@ def init_db():
                 status TEXT DEFAULT 'new'
             )
         """)
+        # Violations list (by job, optionally status, newest first) and the brand scan's (ad, asset) dedup set.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tv_job_status_captured ON trademark_violations(job_id, status, captured_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tv_job_ad_asset ON trademark_violations(job_id, ad_id, matched_asset)")
 
         # Phase 3: NLP triggers
         cur.execute("""
@@ -262,8 +431,76 @@ def init_db():
             )
         """)
 
+        # Background task status (see tasks.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                job_id INTEGER,
+                status TEXT NOT NULL,
+                result_json TEXT,
+                error TEXT,
+                created_at_utc TEXT NOT NULL,
+                finished_at_utc TEXT
+            )
+        """)
+        # Google Trends responses keyed by sha1 of (keywords, geo, timeframe); payload is compressed JSON.
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS trends_cache (
+                key TEXT PRIMARY KEY,
+                fetched_at_utc TEXT NOT NULL,
+                payload BLOB NOT NULL
+            )
+        """)
+        # Gemini results keyed by sha256 of (model, prompt version, ad copy), so unchanged copy is never re-billed.
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                result_json TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        # Planner statistics (e.g. which ads index a GROUP BY advertiser should use): a full ANALYZE the first
+        # time, afterwards optimize() re-analyzes only tables whose size has drifted.
+        cur.execute("PRAGMA analysis_limit = 1000")
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        cur.execute("ANALYZE" if cur.fetchone() is None else "PRAGMA optimize = 0x10002")
+
     logger.info("Database initialized at %s", DB_PATH)
 
 
+def optimize():
+    """Refresh planner statistics where they have gone stale (cheap no-op otherwise); call after bulk ingestion."""
+    with cursor() as cur:
+        cur.execute("PRAGMA analysis_limit = 1000")
+        cur.execute("PRAGMA optimize = 0x10002")
+
+
 def utc_now():
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def llm_cache_get(keys) -> dict:
+    """Return {key: parsed result} for the keys present in llm_cache."""
+    keys = list(set(keys))
+    out = {}
+    with read_cursor() as cur:
+        # Chunked to stay well under SQLite's bound-parameter limit.
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            cur.execute(
+                f"SELECT key, result_json FROM llm_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            out.update((r["key"], json.loads(r["result_json"])) for r in cur.fetchall())
+    return out
+
+
+def llm_cache_put(items) -> None:
+    """Store (key, result) pairs in llm_cache, replacing older results for the same key."""
+    now = utc_now()
+    rows = [(key, json.dumps(result), now) for key, result in items]
+    if not rows:
+        return
+    with cursor() as cur:
+        cur.executemany("INSERT OR REPLACE INTO llm_cache (key, result_json, created_at) VALUES (?,?,?)", rows)
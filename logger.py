@@ -1,16 +1,43 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 
 # Log file next to this module when possible, else cwd
 _log_dir = os.path.dirname(os.path.abspath(__file__))
 _log_path = os.path.join(_log_dir, "app.log")
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+_formatter = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler(_log_path, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
\ No newline at end of file
+)
+_file_handler = logging.FileHandler(_log_path, encoding='utf-8')
+_stream_handler = logging.StreamHandler()
+for _h in (_file_handler, _stream_handler):
+    _h.setFormatter(_formatter)
+
+# Request/task threads only enqueue records; a listener thread does the file and console writes.
+_queue = queue.SimpleQueue()
+_listener = logging.handlers.QueueListener(_queue, _file_handler, _stream_handler, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
+# INFO by default; LOG_LEVEL=DEBUG for verbose output.
+# (Not basicConfig: it would give the QueueHandler a default formatter and records would be formatted twice.)
+_root = logging.getLogger()
+_root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+_root.addHandler(logging.handlers.QueueHandler(_queue))
+
+
+def configure_worker_logging():
+    """Process-pool initializer: write straight to the file/console handlers.
+
+    A forked worker inherits the QueueHandler but not the listener thread, so queued records would never be written.
+    """
+    for h in list(_root.handlers):
+        if isinstance(h, logging.handlers.QueueHandler):
+            _root.removeHandler(h)
+    for h in (_file_handler, _stream_handler):
+        if h not in _root.handlers:
+            _root.addHandler(h)
@@ -1,9 +1,9 @@
 """One-off script to dump raw SerpAPI Ads Transparency Center response. Run from project root with .env set.
-   Usage: python scripts/dump_atc_response.py "Nike"
-   Then check scripts/atc_response_sample.json for the structure.
+   Usage: python scripts/dump_atc_response.py "Nike" ["Adidas" ...]
+   Then check scripts/atc_response_sample.json (one name) or scripts/atc_response_<name>.json (several) for the structure.
 """
-import json
 import os
+import re
 import sys
 
 # Load .env and project config
@@ -11,15 +11,13 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 load_dotenv()
 
+import orjson
+
 from config import SERPAPI_API_KEY
-import requests
+from utils import build_session
 
-def main():
-    text = sys.argv[1] if len(sys.argv) > 1 else "Nike"
-    region = os.environ.get("ATC_REGION", "US")
-    if not SERPAPI_API_KEY:
-        print("Set SERPAPI_API_KEY in .env")
-        return 1
+
+def dump(session, text: str, region: str, out_path: str) -> int:
     url = "https://serpapi.com/search"
     params = {
         "engine": "google_ads_transparency_center",
@@ -29,21 +27,39 @@ def main():
         "api_key": SERPAPI_API_KEY,
     }
     print(f"Requesting ATC list: text={text!r}, region={region!r} ...")
-    r = requests.get(url, params=params, timeout=60)
+    r = session.get(url, params=params, timeout=60)
     print(f"Status: {r.status_code}")
     try:
-        data = r.json()
-    except Exception as e:
+        data = orjson.loads(r.content)
+    except orjson.JSONDecodeError as e:
         print(f"Response is not JSON: {e}")
         print("Body (first 500 chars):", r.text[:500])
         return 1
     keys = list(data.keys()) if isinstance(data, dict) else []
     print(f"Top-level keys: {keys}")
-    out_path = os.path.join(os.path.dirname(__file__), "atc_response_sample.json")
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, default=str)
+    with open(out_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
     print(f"Full response written to {out_path}")
     return 0
 
+
+def main():
+    texts = sys.argv[1:] or ["Nike"]
+    region = os.environ.get("ATC_REGION", "US")
+    if not SERPAPI_API_KEY:
+        print("Set SERPAPI_API_KEY in .env")
+        return 1
+    out_dir = os.path.dirname(__file__)
+    # One keep-alive session (retry/backoff on 429/5xx) so several names share the TLS connection.
+    session = build_session(pool_maxsize=4)
+    status = 0
+    for text in texts:
+        if len(texts) == 1:
+            name = "atc_response_sample.json"
+        else:
+            name = "atc_response_" + (re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_").lower() or "blank") + ".json"
+        status |= dump(session, text, region, os.path.join(out_dir, name))
+    return status
+
 if __name__ == "__main__":
     sys.exit(main())
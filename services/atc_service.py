@@ -1,16 +1,22 @@
 """Google Ads Transparency Center via SerpAPI."""
-import json
 import logging
+import zlib
 
+import orjson
 import requests
 
 from config import SERPAPI_API_KEY
 from db import cursor, utc_now
-from utils import redact_api_keys
+from utils import TTLCache, build_session, redact_api_keys
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://serpapi.com/search"
+# SerpAPI is paid per call and ATC data changes slowly: reuse successful responses for 15 minutes.
+_list_cache = TTLCache(maxsize=256, ttl=900)
+_details_cache = TTLCache(maxsize=512, ttl=900)
+# Keep-alive session: a list lookup is followed by advertiser/detail calls to the same host.
+_session = build_session(pool_maxsize=32)
 
 # SerpAPI ATC expects numeric region codes (e.g. 2840 for US), not "US".
 def _atc_region_code(region: str) -> str:
@@ -22,13 +28,18 @@ def _atc_region_code(region: str) -> str:
     return str(region)
 
 
-def _search(params: dict) -> dict:
+def _search_raw(params: dict):
+    """Return (parsed response, raw response bytes) so callers can store the payload without re-serializing it."""
     if not SERPAPI_API_KEY:
         raise ValueError("SERPAPI_API_KEY is not set")
     params = {**params, "api_key": SERPAPI_API_KEY}
-    r = requests.get(BASE_URL, params=params, timeout=60)
+    r = _session.get(BASE_URL, params=params, timeout=60)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content), r.content
+
+
+def _search(params: dict) -> dict:
+    return _search_raw(params)[0]
 
 
 def atc_list(advertiser: str, region: str = "US", page: int = 1):
@@ -40,6 +51,12 @@ def atc_list(advertiser: str, region: str = "US", page: int = 1):
     # SerpAPI ATC requires numeric region code (e.g. 2840 for United States), not "US".
     region_param = _atc_region_code(region)
 
+    # Keyed on the resolved code so "US", "us" and "2840" share one entry.
+    cache_key = (advertiser.lower(), region_param, page)
+    hit = _list_cache.get(cache_key)
+    if hit is not None:
+        return hit
+
     # First try: text search (may return matching advertisers or direct ads depending on SerpAPI)
     params = {
         "engine": "google_ads_transparency_center",
@@ -48,7 +65,7 @@ def atc_list(advertiser: str, region: str = "US", page: int = 1):
         "num": 100,
     }
     try:
-        data = _search(params)
+        data, raw = _search_raw(params)
     except requests.exceptions.HTTPError as e:
         err_body = ""
         if e.response is not None:
@@ -128,14 +145,16 @@ def atc_list(advertiser: str, region: str = "US", page: int = 1):
     if not creatives and isinstance(data, dict):
         creatives = _extract_ads_from_any_key(data, region)
 
+    # Whole payload zlib-compressed (same format as utils.compress_json) so the creative diff can parse it back.
     with cursor() as cur:
         cur.execute(
             """INSERT INTO atc_snapshots (advertiser, region, raw_json, synced_at_utc) VALUES (?,?,?,?)""",
-            (advertiser, region, json.dumps(data)[:100000] if data else None, now),
+            (advertiser, region, zlib.compress(raw, 6) if data else None, now),
         )
     out = {"creatives": creatives, "synced_at_utc": now, "raw_keys": raw_keys}
     if not creatives and isinstance(data, dict):
         out["response_structure"] = _describe_structure(data)
+    _list_cache.set(cache_key, out)
     return out
 
 
@@ -163,34 +182,29 @@ def _describe_structure(obj, max_depth=2):
     return type(obj).__name__
 
 
-def _extract_ads_from_any_key(obj, region="", seen=None):
-    """Recursively find lists of dicts that look like ad creatives."""
-    if seen is None:
-        seen = set()
-    if id(obj) in seen:
-        return []
-    if isinstance(obj, dict):
-        seen.add(id(obj))
-        for key, val in obj.items():
-            if isinstance(val, list) and val and isinstance(val[0], dict):
+def _extract_ads_from_any_key(obj, region=""):
+    """Depth-first search (explicit stack, so deep responses can't hit the recursion limit) for the first
+    dict value that is a list of dicts looking like ad creatives."""
+    seen = set()
+    # (node, is a dict value): only lists found directly under a key are candidate ad lists.
+    stack = [(obj, False)]
+    while stack:
+        cur, under_key = stack.pop()
+        if isinstance(cur, dict):
+            if id(cur) in seen:
+                continue
+            seen.add(id(cur))
+            # Reversed so values are visited in key order, as the response lays them out.
+            stack.extend((val, True) for val in reversed(list(cur.values())))
+        elif isinstance(cur, list):
+            if under_key and cur and isinstance(cur[0], dict):
                 # Check if items look like ads
-                first = val[0]
+                first = cur[0]
                 if any(first.get(k) for k in ("ad_id", "creative_id", "id", "title", "headline")):
-                    out = []
-                    for c in val:
-                        if isinstance(c, dict):
-                            out.append(_normalize_creative(c, region))
+                    out = [_normalize_creative(c, region) for c in cur if isinstance(c, dict)]
                     if out:
                         return out
-            out = _extract_ads_from_any_key(val, region, seen)
-            if out:
-                return out
-        return []
-    if isinstance(obj, list):
-        for item in obj:
-            out = _extract_ads_from_any_key(item, region, seen)
-            if out:
-                return out
+            stack.extend((item, False) for item in reversed(cur))
     return []
 
 
@@ -208,6 +222,9 @@ def _normalize_creative(c: dict, region: str) -> dict:
 
 def atc_details(ad_id: str, region: str):
     """Fetch ATC ad details by creative ID. Returns dict with normalized, synced_at_utc."""
+    hit = _details_cache.get((ad_id, region))
+    if hit is not None:
+        return hit
     region_param = _atc_region_code(region)
     params = {
         "engine": "google_ads_transparency_center_ad_details",
@@ -221,7 +238,9 @@ def atc_details(ad_id: str, region: str):
         return {"normalized": {}, "error": redact_api_keys(str(e)), "synced_at_utc": None}
     now = utc_now()
     normalized = _normalize_atc_details(data)
-    return {"normalized": normalized, "synced_at_utc": now}
+    out = {"normalized": normalized, "synced_at_utc": now}
+    _details_cache.set((ad_id, region), out)
+    return out
 
 
 def _normalize_atc_details(data: dict) -> dict:
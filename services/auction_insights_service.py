@@ -1,8 +1,10 @@
 """Proxy auction insights: overlap rate and outranking share from longitudinal SERP data."""
+import itertools
 import logging
-from collections import defaultdict
 from datetime import datetime, timezone, timedelta
 
+import numpy as np
+
 from db import cursor
 
 logger = logging.getLogger(__name__)
@@ -22,52 +24,57 @@ def compute_auction_insights(job_id: int, window_days: int, device: str) -> list
             (job_id, cutoff, device, device),
         )
         rows = cur.fetchall()
-    # snapshot_id -> list of (advertiser, block, position)
-    snap_advertisers = defaultdict(list)
-    for r in rows:
-        snap_advertisers[r["snapshot_id"]].append((r["advertiser"], r["block"] or "bottom", r["position"] or 999))
-    snapshot_ids = list(snap_advertisers.keys())
-    if not snapshot_ids:
+    if not rows:
         return []
-    advertisers = set()
-    for v in snap_advertisers.values():
-        for adv, _, _ in v:
-            advertisers.add(adv)
-    advertisers = sorted(advertisers)
-    n_snaps = len(snapshot_ids)
-    # overlap: both appear in same snapshot
-    overlap = defaultdict(lambda: defaultdict(int))
-    outrank_ab = defaultdict(lambda: defaultdict(int))
-    outrank_ba = defaultdict(lambda: defaultdict(int))
-    for snap_id, adv_list in snap_advertisers.items():
-        adv_set = set(a[0] for a in adv_list)
-        positions = {a[0]: (a[1], a[2]) for a in adv_list}
-        for a in advertisers:
-            for b in advertisers:
-                if a >= b:
-                    continue
-                if a in adv_set and b in adv_set:
-                    overlap[a][b] += 1
-                    pos_a = positions[a]
-                    pos_b = positions[b]
-                    if pos_a[1] < pos_b[1] or (pos_a[1] == pos_b[1] and pos_a[0] == "top" and pos_b[0] != "top"):
-                        outrank_ab[a][b] += 1
-                    else:
-                        outrank_ba[a][b] += 1
+    # One pass over the rows: dense snapshot / advertiser codes (first-seen order) and a rank key, lower is better:
+    # position first (missing = 999), then a top-block ad beats a non-top one.
+    snap_codes, adv_codes = {}, {}
+    cols = np.array(
+        [(snap_codes.setdefault(r[0], len(snap_codes)), adv_codes.setdefault(r[1], len(adv_codes)),
+          (r[3] or 999) * 2 + (r[2] != "top")) for r in rows],
+        np.int64,
+    )
+    snap, key = cols[:, 0], cols[:, 2]
+    # Re-code advertisers alphabetically so pairs come out as (a, b) with a < b.
+    advertisers = sorted(adv_codes)
+    n_adv = len(advertisers)
+    remap = np.empty(n_adv, np.int64)
+    remap[[adv_codes[a] for a in advertisers]] = np.arange(n_adv)
+    adv = remap[cols[:, 1]]
+    n_snaps = len(snap_codes)
+    # One entry per (snapshot, advertiser), keeping an advertiser's last row in a snapshot; the result is ordered
+    # by snapshot, then advertiser.
+    cell = snap * n_adv + adv
+    _, last = np.unique(cell[::-1], return_index=True)
+    keep = len(cell) - 1 - last
+    snap, adv, key = snap[keep], adv[keep], key[keep]
+    # Co-occurring pairs are entries d apart within the same snapshot (adv[i] < adv[j] by construction); a SERP
+    # holds ~10 ads, so this is a handful of vector passes.
+    firsts, seconds = [], []
+    for d in range(1, len(snap)):
+        i = np.flatnonzero(snap[:-d] == snap[d:])
+        if not i.size:
+            break
+        firsts.append(i)
+        seconds.append(i + d)
+    counts = {}
+    if firsts:
+        i, j = np.concatenate(firsts), np.concatenate(seconds)
+        pair_ids, inverse = np.unique(adv[i] * n_adv + adv[j], return_inverse=True)
+        overlap = np.bincount(inverse, minlength=len(pair_ids))
+        outrank = np.bincount(inverse, weights=key[i] < key[j], minlength=len(pair_ids)).astype(np.int64)
+        counts = dict(zip(pair_ids.tolist(), zip(overlap.tolist(), outrank.tolist())))
+    # Every pair is still reported (zeros included) so advertisers that never co-occur stay listed.
     result = []
-    for a in advertisers:
-        for b in advertisers:
-            if a >= b:
-                continue
-            o = overlap[a][b]
-            oab = outrank_ab[a][b]
-            oba = outrank_ba[a][b]
-            result.append({
-                "advertiser_a": a,
-                "advertiser_b": b,
-                "overlap_rate": round(o / n_snaps, 4) if n_snaps else 0,
-                "outranking_share_ab": round(oab / n_snaps, 4) if n_snaps else 0,
-                "outranking_share_ba": round(oba / n_snaps, 4) if n_snaps else 0,
-                "snapshot_count": n_snaps,
-            })
+    for (ia, a), (ib, b) in itertools.combinations(enumerate(advertisers), 2):
+        o, oab = counts.get(ia * n_adv + ib, (0, 0))
+        oba = o - oab
+        result.append({
+            "advertiser_a": a,
+            "advertiser_b": b,
+            "overlap_rate": round(o / n_snaps, 4) if n_snaps else 0,
+            "outranking_share_ab": round(oab / n_snaps, 4) if n_snaps else 0,
+            "outranking_share_ba": round(oba / n_snaps, 4) if n_snaps else 0,
+            "snapshot_count": n_snaps,
+        })
     return result
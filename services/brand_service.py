@@ -1,13 +1,36 @@
 """Brand hijacking and trademark monitoring: scan ads for brand terms, record violations, generate complaint doc."""
+import itertools
 import json
 import logging
+import multiprocessing
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 from db import cursor, utc_now
+from utils import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Matching is CPU-bound: above this many ads the scan is split across worker processes, in chunks of _SCAN_CHUNK ads.
+PARALLEL_SCAN_MIN_ADS = 5000
+_SCAN_CHUNK = 2000
+# Matchers compiled once per worker process by _init_scan_worker.
+_worker_matchers = None
+# Workers are started fresh rather than forked: the app process runs request, task and scheduler threads, and a fork
+# can copy a lock one of them holds. forkserver where available (Linux), else spawn (Windows, macOS).
+_mp_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# job_id -> (asset rows, compiled matchers). Cleared when an asset is added; the TTL bounds staleness across processes.
+_assets_cache = TTLCache(maxsize=256, ttl=300)
+
 
 def list_brand_assets(job_id: int = None):
     """List brand assets (job_id or global if job_id None)."""
@@ -19,41 +42,105 @@ def list_brand_assets(job_id: int = None):
         return [dict(r) for r in cur.fetchall()]
 
 
+def list_brand_assets_for_job(job_id: int):
+    """List a job's brand assets followed by the global ones, in one query."""
+    with cursor() as cur:
+        cur.execute(
+            """SELECT id, job_id, term, pattern_type, regex_pattern FROM brand_assets
+            WHERE job_id = ? OR job_id IS NULL ORDER BY (job_id IS NULL), id""",
+            (job_id,),
+        )
+        return [dict(r) for r in cur.fetchall()]
+
+
 def add_brand_asset(job_id=None, term: str = "", pattern_type: str = "literal", regex_pattern: str = None):
     with cursor() as cur:
         cur.execute(
             "INSERT INTO brand_assets (job_id, term, pattern_type, regex_pattern) VALUES (?,?,?,?)",
             (job_id, term, pattern_type, regex_pattern or ""),
         )
-        return cur.lastrowid
+        asset_id = cur.lastrowid
+    # A global asset (job_id None) applies to every job, so drop all cached sets rather than one entry.
+    _assets_cache.clear()
+    return asset_id
+
+
+def _compile_assets(assets: list) -> list:
+    """Turn brand assets into matchers once per scan: ("regex", (label, pattern)) per regex asset, and the literal
+    terms as one ("automaton", Aho-Corasick automaton) or, without pyahocorasick, ("literal", (label, lowered))."""
+    matchers = []
+    literals = {}
+    for asset in assets:
+        term = (asset.get("term") or "").strip()
+        pattern_type = asset.get("pattern_type") or "literal"
+        regex_pattern = asset.get("regex_pattern") or ""
+        if pattern_type == "regex" and regex_pattern:
+            try:
+                matchers.append(("regex", (term or regex_pattern[:50], re.compile(regex_pattern, re.I))))
+            except re.error:
+                pass
+        elif term:
+            literals.setdefault(term.lower(), []).append(term)
+    if literals and ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for lowered, labels in literals.items():
+            automaton.add_word(lowered, (lowered, labels))
+        automaton.make_automaton()
+        matchers.append(("automaton", automaton))
+    else:
+        matchers.extend(("literal", (label, lowered)) for lowered, labels in literals.items() for label in labels)
+    return matchers
+
+
+def _match_asset(text: str, text_lower: str, matcher: tuple) -> list:
+    """Return list of (matched_asset, snippet) for text; text_lower is text.lower(), computed once per ad."""
+    kind, payload = matcher
+    if kind == "regex":
+        label, pattern = payload
+        return [(label, m.group(0)[:200]) for m in pattern.finditer(text)]
+    if kind == "literal":
+        label, lowered = payload
+        start = text_lower.find(lowered)
+        return [(label, text[start : start + len(label) + 40])] if start >= 0 else []
+    # All literal terms in one pass; like str.find, only each term's first occurrence is reported.
+    out = []
+    seen = set()
+    for end, (lowered, labels) in payload.iter(text_lower):
+        if lowered in seen:
+            continue
+        seen.add(lowered)
+        start = end - len(lowered) + 1
+        out.extend((label, text[start : start + len(label) + 40]) for label in labels)
+    return out
+
+
+def _init_scan_worker(assets: list):
+    from logger import configure_worker_logging
+
+    configure_worker_logging()
+    global _worker_matchers
+    _worker_matchers = _compile_assets(assets)
 
 
-def _match_asset(text: str, asset: dict) -> list:
-    """Return list of (matched_asset, snippet) for text."""
-    if not text:
-        return []
-    text_lower = text.lower()
-    term = (asset.get("term") or "").strip()
-    pattern_type = asset.get("pattern_type") or "literal"
-    regex_pattern = asset.get("regex_pattern") or ""
+def _scan_texts(texts: list, matchers: list = None) -> list:
+    """Return, per ad text, its (matched_asset, snippet) list across all matchers (default: the worker's)."""
+    if matchers is None:
+        matchers = _worker_matchers
     out = []
-    if pattern_type == "regex" and regex_pattern:
-        try:
-            for m in re.finditer(regex_pattern, text, re.I):
-                out.append((term or regex_pattern[:50], m.group(0)[:200]))
-        except re.error:
-            pass
-    else:
-        if term and term.lower() in text_lower:
-            start = text_lower.find(term.lower())
-            snippet = text[start : start + len(term) + 40]
-            out.append((term, snippet))
+    for text in texts:
+        text_lower = text.lower()
+        out.append([m for matcher in matchers for m in _match_asset(text, text_lower, matcher)])
     return out
 
 
 def scan_ads_for_brand(job_id: int, since_utc: str = None):
     """Scan all ads for job (since optional) against brand_assets. Insert into trademark_violations."""
-    assets = list_brand_assets(job_id) + list_brand_assets(None)
+    hit = _assets_cache.get(job_id)
+    if hit is None:
+        raw_assets = list_brand_assets_for_job(job_id)
+        hit = (raw_assets, _compile_assets(raw_assets))
+        _assets_cache.set(job_id, hit)
+    raw_assets, assets = hit
     if not assets:
         return 0
     with cursor() as cur:
@@ -69,32 +156,36 @@ def scan_ads_for_brand(job_id: int, since_utc: str = None):
                 (job_id,),
             )
         ads = cur.fetchall()
-    count = 0
-    for ad in ads:
-        texts = [
-            ad["headline"] or "",
-            ad["description"] or "",
-            ad["displayed_link"] or "",
-        ]
-        combined = " ".join(texts)
-        for asset in assets:
-            matches = _match_asset(combined, asset)
-            for matched_asset, snippet in matches:
-                with cursor() as cur:
-                    cur.execute(
-                        """SELECT id FROM trademark_violations
-                        WHERE job_id = ? AND ad_id = ? AND matched_asset = ? LIMIT 1""",
-                        (job_id, ad["id"], matched_asset),
-                    )
-                    if cur.fetchone():
-                        continue
-                    cur.execute(
-                        """INSERT INTO trademark_violations (job_id, ad_id, advertiser, source, matched_asset, matched_text_snippet, captured_at, status)
-                        VALUES (?,?,?,?,?,?,?,?)""",
-                        (job_id, ad["id"], ad["advertiser"], "serp", matched_asset, snippet, ad["created_at_utc"], "new"),
-                    )
-                    count += 1
-    return count
+        # Already-recorded (ad, asset) pairs, checked in memory instead of one SELECT per match.
+        cur.execute("SELECT ad_id, matched_asset FROM trademark_violations WHERE job_id = ?", (job_id,))
+        existing = {(r["ad_id"], r["matched_asset"]) for r in cur.fetchall()}
+    texts = [" ".join((ad["headline"] or "", ad["description"] or "", ad["displayed_link"] or "")) for ad in ads]
+    if len(texts) > PARALLEL_SCAN_MIN_ADS:
+        # Workers get the raw asset rows (they compile their own matchers) and plain strings; map keeps ad order,
+        # so the dedup below picks the same rows as a serial scan.
+        chunks = [texts[i : i + _SCAN_CHUNK] for i in range(0, len(texts), _SCAN_CHUNK)]
+        workers = min(os.cpu_count() or 1, len(chunks))
+        with ProcessPoolExecutor(
+            workers, mp_context=_mp_context, initializer=_init_scan_worker, initargs=(raw_assets,)
+        ) as pool:
+            found = list(itertools.chain.from_iterable(pool.map(_scan_texts, chunks)))
+    else:
+        found = _scan_texts(texts, assets)
+    pending = []
+    for ad, matches in zip(ads, found):
+        for matched_asset, snippet in matches:
+            if (ad["id"], matched_asset) in existing:
+                continue
+            existing.add((ad["id"], matched_asset))
+            pending.append((job_id, ad["id"], ad["advertiser"], "serp", matched_asset, snippet, ad["created_at_utc"], "new"))
+    if pending:
+        with cursor() as cur:
+            cur.executemany(
+                """INSERT INTO trademark_violations (job_id, ad_id, advertiser, source, matched_asset, matched_text_snippet, captured_at, status)
+                VALUES (?,?,?,?,?,?,?,?)""",
+                pending,
+            )
+    return len(pending)
 
 
 def list_violations(job_id: int = None, status: str = None):
@@ -116,7 +207,8 @@ def list_violations(job_id: int = None, status: str = None):
                 """SELECT id, job_id, ad_id, advertiser, source, matched_asset, matched_text_snippet, captured_at, reviewed_at, status
                 FROM trademark_violations ORDER BY captured_at DESC LIMIT 500"""
             )
-        return [dict(r) for r in cur.fetchall()]
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
 
 
 def generate_complaint_doc(violation_ids: list) -> str:
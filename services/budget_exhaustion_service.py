@@ -1,8 +1,11 @@
 """Competitor budget exhaustion: hourly presence tracking for high-value targets."""
 import logging
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
+from config import SERPAPI_API_KEY
 from db import cursor, utc_now
+from services.serpapi_service import _domain_from_link, _location_for_serpapi, _search
 
 logger = logging.getLogger(__name__)
 
@@ -16,20 +19,20 @@ def record_presence(target_id: int, advertiser: str, appeared: bool):
         )
 
 
-def run_budget_tracking_for_target(target_id: int) -> bool:
-    """Run one presence snapshot for a single target. Target must have budget_tracking_enabled=1. Returns True if run, False if skipped."""
+def record_presence_bulk(rows: list):
+    """Insert (target_id, advertiser, timestamp_utc, appeared) rows in one transaction."""
+    if not rows:
+        return
     with cursor() as cur:
-        cur.execute(
-            "SELECT id, job_id, keyword, location_input, serp_location, gl, hl FROM targets WHERE id = ? AND budget_tracking_enabled = 1",
-            (target_id,),
+        cur.executemany(
+            "INSERT INTO presence_snapshots (target_id, advertiser, timestamp_utc, appeared) VALUES (?,?,?,?)",
+            rows,
         )
-        t = cur.fetchone()
-    if not t:
-        return False
-    t = dict(t)
+
+
+def _track_one(t: dict) -> bool:
+    """Run one presence snapshot for target row t. Returns True if run, False if skipped or failed."""
     try:
-        from services.serpapi_service import _search, _location_for_serpapi
-        from config import SERPAPI_API_KEY
         if not SERPAPI_API_KEY:
             return False
         loc = t["serp_location"] or t["location_input"]
@@ -41,6 +44,8 @@ def run_budget_tracking_for_target(target_id: int) -> bool:
             "gl": t["gl"] or "us",
             "hl": t["hl"] or "en",
             "device": "desktop",
+            # Only the ads block is read here; have SerpAPI drop organic results, knowledge graph, etc. from the body.
+            "json_restrictor": "ads",
         })
         ads = result.get("ads") or result.get("paid") or []
         advertisers = set()
@@ -48,77 +53,57 @@ def run_budget_tracking_for_target(target_id: int) -> bool:
             if isinstance(ad, dict):
                 link = ad.get("displayed_link") or ad.get("link") or ad.get("destination_link") or ""
                 if link:
-                    from services.serpapi_service import _domain_from_link
                     advertisers.add(_domain_from_link(link))
-        for adv in advertisers:
-            record_presence(t["id"], adv, True)
+        now = utc_now()
+        record_presence_bulk([(t["id"], adv, now, 1) for adv in advertisers])
         return True
     except Exception as e:
         logger.exception("Budget tracking failed for target %s: %s", t["id"], e)
         return False
 
 
-def run_budget_tracking_cycle():
+def run_budget_tracking_for_target(target_id: int) -> bool:
+    """Run one presence snapshot for a single target. Target must have budget_tracking_enabled=1. Returns True if run, False if skipped."""
+    with cursor() as cur:
+        cur.execute(
+            "SELECT id, job_id, keyword, location_input, serp_location, gl, hl FROM targets WHERE id = ? AND budget_tracking_enabled = 1",
+            (target_id,),
+        )
+        t = cur.fetchone()
+    if not t:
+        return False
+    return _track_one(dict(t))
+
+
+def run_budget_tracking_cycle(max_workers: int = 8):
     """For each target with budget_tracking_enabled=1, run SERP, record which advertisers appeared."""
     with cursor() as cur:
         cur.execute("SELECT id, job_id, keyword, location_input, serp_location, gl, hl FROM targets WHERE budget_tracking_enabled = 1")
         targets = [dict(r) for r in cur.fetchall()]
-    for t in targets:
-        try:
-            from services.serpapi_service import _search, _location_for_serpapi
-            from config import SERPAPI_API_KEY
-            if not SERPAPI_API_KEY:
-                continue
-            loc = t["serp_location"] or t["location_input"]
-            loc = _location_for_serpapi(loc, t.get("gl") or "us")
-            result = _search({
-                "q": t["keyword"],
-                "engine": "google",
-                "location": loc,
-                "gl": t["gl"] or "us",
-                "hl": t["hl"] or "en",
-                "device": "desktop",
-            })
-            ads = result.get("ads") or result.get("paid") or []
-            advertisers = set()
-            for ad in ads:
-                if isinstance(ad, dict):
-                    link = ad.get("displayed_link") or ad.get("link") or ad.get("destination_link") or ""
-                    if link:
-                        from services.serpapi_service import _domain_from_link
-                        advertisers.add(_domain_from_link(link))
-            for adv in advertisers:
-                record_presence(t["id"], adv, True)
-        except Exception as e:
-            logger.exception("Budget tracking failed for target %s: %s", t["id"], e)
+    if not targets:
+        return
+    # SerpAPI calls are independent and I/O-bound; _track_one logs its own failures so one never stops the rest.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as pool:
+        list(pool.map(_track_one, targets))
 
 
 def get_presence_24h(target_id: int) -> list:
     """Return list of {advertiser, hours_present, first_hour, last_hour} for last 24h."""
+    # Bound ISO cutoff in the stored format: comparable as a string and a range seek on idx_presence_target_time.
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    # One row per advertiser; hours only count where the advertiser appeared, so "seen but absent" rows give 0/None.
     with cursor() as cur:
         cur.execute(
-            """SELECT advertiser, strftime('%H', timestamp_utc) AS hour, MAX(appeared) AS appeared
-            FROM presence_snapshots
-            WHERE target_id = ? AND timestamp_utc >= datetime('now', '-1 day')
-            GROUP BY advertiser, strftime('%H', timestamp_utc)"""
-            ,
-            (target_id,),
+            """SELECT advertiser,
+                COUNT(DISTINCT hour) FILTER (WHERE appeared) AS hours_present,
+                MIN(hour) FILTER (WHERE appeared) AS first_hour,
+                MAX(hour) FILTER (WHERE appeared) AS last_hour
+            FROM (
+                SELECT advertiser, CAST(strftime('%H', timestamp_utc) AS INTEGER) AS hour, appeared
+                FROM presence_snapshots
+                WHERE target_id = ? AND timestamp_utc >= ?
+            )
+            GROUP BY advertiser""",
+            (target_id, cutoff),
         )
-        rows = cur.fetchall()
-    by_adv = {}
-    for r in rows:
-        adv = r["advertiser"]
-        if adv not in by_adv:
-            by_adv[adv] = set()
-        if r["appeared"]:
-            by_adv[adv].add(int(r["hour"]))
-    result = []
-    for adv, hours in by_adv.items():
-        h_list = sorted(hours)
-        result.append({
-            "advertiser": adv,
-            "hours_present": len(h_list),
-            "first_hour": h_list[0] if h_list else None,
-            "last_hour": h_list[-1] if h_list else None,
-        })
-    return result
+        return [dict(r) for r in cur.fetchall()]
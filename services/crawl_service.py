@@ -1,42 +1,123 @@
 """Crawl landing page and PageSpeed Insights."""
-import json
+import html as html_lib
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+import orjson
 from bs4 import BeautifulSoup
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
 from config import PAGESPEED_API_KEY
 from db import cursor, utc_now
+from utils import TTLCache, build_session
 
 logger = logging.getLogger(__name__)
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-OFFER_PATTERNS = re.compile(
-    r"\b(free\s*trial|%\s*off|discount|guarantee|financing|0%\s*apr|no\s*payment|save\s*\d+|offer|limited\s*time)\b",
+# Keep-alive sessions: one for landing pages (fewer retries, pages are often slow or gone), one for PageSpeed.
+_page_session = build_session(retries=1, headers={"User-Agent": USER_AGENT})
+_psi_session = build_session()
+_psi_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="psi")
+# PageSpeed scores change over hours/days and each call takes seconds: reuse a URL's successful result for 12h.
+_psi_cache = TTLCache(maxsize=1024, ttl=12 * 3600)
+# Only the head of a landing page is parsed; stop reading (and decoding) fat pages here.
+MAX_PAGE_BYTES = 512 * 1024
+# Offer / pricing / financing heuristics fused into one alternation so page text is scanned once.
+# "financing" and "0% apr" count as both an offer and a financing mention ("save 0% apr" too, via save_apr).
+LANDING_PATTERNS = re.compile(
+    r"\b(?:"
+    r"(?P<offer_financing>financing|0%\s*apr)"
+    r"|(?P<offer>free\s*trial|%\s*off|discount|guarantee|no\s*payment|save\s*\d+(?P<save_apr>(?<=\s0)(?=%\s*apr\b))?|offer|limited\s*time)"
+    r"|(?P<pricing>\$\d+|price|pricing|cost|affordable)"
+    r"|(?P<financing>monthly\s*payment|lease|loan)"
+    r")\b",
     re.I,
 )
-PRICING_PATTERNS = re.compile(r"\b(\$\d+|price|pricing|cost|affordable)\b", re.I)
-FINANCING_PATTERNS = re.compile(r"\b(financing|0%\s*apr|monthly\s*payment|lease|loan)\b", re.I)
+
+# Offer heuristics only need visible text near the top of the page, so it is pulled out of the raw HTML
+# with two regexes instead of walking every DOM text node.
+SCAN_HTML_CHARS = 200_000
+_NON_TEXT_RE = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>|<!--.*?-->", re.I | re.S)
+# A non-text block still open after _NON_TEXT_RE ran was cut off by the SCAN_HTML_CHARS window.
+_UNCLOSED_RE = re.compile(r"<(?:script|style|noscript|template)\b|<!--", re.I)
+_TAG_RE = re.compile(r"<[^>]*>")
 
 
-def fetch_page(url: str, timeout: int = 15):
-    """Fetch URL and return (final_url, status_code, text)."""
+def fetch_page(url: str, timeout: int = 15, max_bytes: int = MAX_PAGE_BYTES):
+    """Fetch URL and return (final_url, status_code, text). Reads at most max_bytes of the body."""
     try:
-        r = requests.get(
+        with _page_session.get(
             url,
-            headers={"User-Agent": USER_AGENT},
             timeout=timeout,
             allow_redirects=True,
-        )
-        return r.url, r.status_code, r.text
+            stream=True,
+        ) as r:
+            ctype = r.headers.get("Content-Type", "").lower()
+            if ctype and "html" not in ctype and "text/" not in ctype:
+                # PDFs, images, downloads: nothing to extract, so don't pull the body at all.
+                return r.url, r.status_code, ""
+            chunks, total = [], 0
+            for chunk in r.iter_content(chunk_size=16384):
+                chunks.append(chunk)
+                total += len(chunk)
+                if total >= max_bytes:
+                    break
+            body = b"".join(chunks)[:max_bytes]
+            return r.url, r.status_code, body.decode(r.encoding or "utf-8", errors="replace")
     except Exception as e:
         logger.exception("Fetch failed for %s: %s", url, e)
         return url, 0, ""
 
 
-def extract_landing_fields(html: str, base_url: str):
-    """Extract title, h1, h2s, form, pricing, financing, offers from HTML."""
+def scan_landing_text(text: str, max_offers: int = 15):
+    """Single pass over page text. Returns (pricing_mentions, financing_mentions, first max_offers distinct offers)."""
+    pricing = financing = False
+    offers = {}  # insertion-ordered set: offers come back in page order
+    for m in LANDING_PATTERNS.finditer(text):
+        kind = m.lastgroup
+        if kind == "pricing":
+            pricing = True
+        elif kind == "financing":
+            financing = True
+        else:
+            if len(offers) < max_offers:
+                offers[m.group()] = None
+            if kind == "offer_financing" or m.group("save_apr") is not None:
+                financing = True
+        if pricing and financing and len(offers) >= max_offers:
+            # Nothing further can change the result: stop scanning the rest of the page.
+            break
+    return pricing, financing, list(offers)
+
+
+def _text_for_scan(html: str) -> str:
+    """Visible-ish text of the first SCAN_HTML_CHARS of html (tags stripped, entities unescaped)."""
+    text = _NON_TEXT_RE.sub(" ", html[:SCAN_HTML_CHARS])
+    m = _UNCLOSED_RE.search(text)
+    if m:
+        text = text[: m.start()]
+    return html_lib.unescape(_TAG_RE.sub(" ", text))
+
+
+def _parse_selectolax(html: str):
+    """(title, h1, h2s, has_form) via selectolax's lexbor (C) parser."""
+    tree = LexborHTMLParser(html)
+    title_tag = tree.css_first("title")
+    title = title_tag.text().strip()[:500] if title_tag else ""
+    h1_tag = tree.css_first("h1")
+    h1 = h1_tag.text(strip=True)[:500] if h1_tag else ""
+    h2s = [t[:200] for t in (h.text(strip=True) for h in tree.css("h2")) if t][:20]
+    has_form = tree.css_first("form") is not None
+    return title, h1, h2s, has_form
+
+
+def _parse_bs4(html: str):
+    """(title, h1, h2s, has_form) via BeautifulSoup (fallback when selectolax isn't installed)."""
     soup = BeautifulSoup(html, "html.parser")
     title = ""
     if soup.title and soup.title.string:
@@ -46,11 +127,22 @@ def extract_landing_fields(html: str, base_url: str):
     if h1_tag and h1_tag.get_text():
         h1 = h1_tag.get_text(strip=True)[:500]
     h2s = [h.get_text(strip=True)[:200] for h in soup.find_all("h2") if h.get_text(strip=True)][:20]
-    body_text = soup.get_text(separator=" ", strip=True)[:50000]
     has_form = bool(soup.find("form"))
-    pricing_mentions = bool(PRICING_PATTERNS.search(body_text))
-    financing_mentions = bool(FINANCING_PATTERNS.search(body_text))
-    offers = list(set(OFFER_PATTERNS.findall(body_text)))[:15]
+    return title, h1, h2s, has_form
+
+
+def extract_landing_fields(html: str, base_url: str):
+    """Extract title, h1, h2s, form, pricing, financing, offers from HTML."""
+    title = None
+    if LexborHTMLParser is not None:
+        try:
+            title, h1, h2s, has_form = _parse_selectolax(html)
+        except Exception as e:
+            # lexbor rejects some malformed or oddly encoded pages that html.parser tolerates.
+            logger.debug("selectolax parse failed for %s, using BeautifulSoup: %s", base_url, e)
+    if title is None:
+        title, h1, h2s, has_form = _parse_bs4(html)
+    pricing_mentions, financing_mentions, offers = scan_landing_text(_text_for_scan(html))
     return {
         "title": title,
         "h1": h1,
@@ -66,73 +158,117 @@ def pagespeed_insights(url: str):
     """Call PageSpeed Insights API. Returns dict with performance, accessibility, best_practices, seo."""
     if not PAGESPEED_API_KEY:
         return {}
+    hit = _psi_cache.get(url)
+    if hit is not None:
+        return hit
     try:
-        r = requests.get(
+        r = _psi_session.get(
             "https://www.googleapis.com/pagespeedonline/v5/runPagespeed",
             params={"url": url, "key": PAGESPEED_API_KEY, "strategy": "mobile"},
             timeout=30,
         )
         if r.status_code != 200:
             return {}
-        data = r.json()
+        # Lighthouse reports run to megabytes; orjson parses the bytes directly.
+        data = orjson.loads(r.content)
         cats = data.get("lighthouseResult", {}).get("categories", {})
-        return {
+        out = {
             "performance": cats.get("performance", {}).get("score"),
             "accessibility": cats.get("accessibility", {}).get("score"),
             "best_practices": cats.get("best-practices", {}).get("score"),
             "seo": cats.get("seo", {}).get("score"),
         }
+        _psi_cache.set(url, out)
+        return out
     except Exception as e:
         logger.exception("PageSpeed API failed for %s: %s", url, e)
         return {}
 
 
-def crawl_and_save(ad_id: int, destination_url: str):
-    """Crawl destination URL, run PageSpeed if key set, save to crawls. Returns crawl row dict."""
+def crawl_page(destination_url: str):
+    """Crawl destination URL and run PageSpeed if key set (no DB write). Returns crawl dict without id."""
+    # PageSpeed is an independent round-trip (it follows redirects itself), so run it alongside the fetch.
+    psi_future = _psi_pool.submit(pagespeed_insights, destination_url) if PAGESPEED_API_KEY and destination_url.startswith("http") else None
     final_url, status, html = fetch_page(destination_url)
     fields = extract_landing_fields(html, final_url) if html else {}
-    psi = pagespeed_insights(final_url) if final_url.startswith("http") else {}
-    now = utc_now()
-    with cursor() as cur:
-        cur.execute(
-            """INSERT INTO crawls (ad_id, destination_url, final_url, http_status, title, h1, h2s_json,
-            has_form, pricing_mentions, financing_mentions, offers_json, pagespeed_performance, pagespeed_accessibility,
-            pagespeed_best_practices, pagespeed_seo, synced_at_utc)
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-            (
-                ad_id,
-                destination_url,
-                final_url,
-                status,
-                fields.get("title"),
-                fields.get("h1"),
-                json.dumps(fields.get("h2s", [])),
-                1 if fields.get("has_form") else 0,
-                1 if fields.get("pricing_mentions") else 0,
-                1 if fields.get("financing_mentions") else 0,
-                json.dumps(fields.get("offers", [])),
-                psi.get("performance"),
-                psi.get("accessibility"),
-                psi.get("best_practices"),
-                psi.get("seo"),
-                now,
-            ),
-        )
-        crawl_id = cur.lastrowid
+    psi = psi_future.result() if psi_future else {}
     return {
-        "id": crawl_id,
         "final_url": final_url,
         "http_status": status,
         "title": fields.get("title"),
         "h1": fields.get("h1"),
-        "h2s_json": json.dumps(fields.get("h2s", [])),
+        "h2s_json": orjson.dumps(fields.get("h2s", [])).decode(),
         "has_form": fields.get("has_form"),
         "pricing_mentions": fields.get("pricing_mentions"),
         "financing_mentions": fields.get("financing_mentions"),
-        "offers_json": json.dumps(fields.get("offers", [])),
+        "offers_json": orjson.dumps(fields.get("offers", [])).decode(),
         "pagespeed_performance": psi.get("performance"),
         "pagespeed_accessibility": psi.get("accessibility"),
         "pagespeed_best_practices": psi.get("best_practices"),
         "pagespeed_seo": psi.get("seo"),
-        "synced_at_utc": now,
+        "synced_at_utc": utc_now(),
     }
+
+
+def save_crawls(crawled: list):
+    """Insert (ad_id, destination_url, crawl dict) triples in one transaction; sets each crawl dict's "id"."""
+    with cursor() as cur:
+        for ad_id, destination_url, crawl in crawled:
+            cur.execute(
+                """INSERT INTO crawls (ad_id, destination_url, final_url, http_status, title, h1, h2s_json,
+                has_form, pricing_mentions, financing_mentions, offers_json, pagespeed_performance, pagespeed_accessibility,
+                pagespeed_best_practices, pagespeed_seo, synced_at_utc)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                (
+                    ad_id,
+                    destination_url,
+                    crawl["final_url"],
+                    crawl["http_status"],
+                    crawl["title"],
+                    crawl["h1"],
+                    crawl["h2s_json"],
+                    1 if crawl["has_form"] else 0,
+                    1 if crawl["pricing_mentions"] else 0,
+                    1 if crawl["financing_mentions"] else 0,
+                    crawl["offers_json"],
+                    crawl["pagespeed_performance"],
+                    crawl["pagespeed_accessibility"],
+                    crawl["pagespeed_best_practices"],
+                    crawl["pagespeed_seo"],
+                    crawl["synced_at_utc"],
+                ),
+            )
+            crawl["id"] = cur.lastrowid
+    return [crawl for _, _, crawl in crawled]
+
+
+def crawl_and_save(ad_id: int, destination_url: str):
+    """Crawl destination URL, run PageSpeed if key set, save to crawls. Returns crawl row dict."""
+    crawl = crawl_page(destination_url)
+    save_crawls([(ad_id, destination_url, crawl)])
+    return {"id": crawl.pop("id"), **crawl}
+
+
+def crawl_many(ads: list, max_workers: int = 8):
+    """Crawl many (ad_id, destination_url) pairs concurrently, then save them in one transaction.
+
+    Returns list of crawl dicts (or {"ad_id", "error"}) in input order.
+    """
+
+    def _one(pair):
+        ad_id, url = pair
+        try:
+            return ad_id, url, crawl_page(url)
+        except Exception as e:
+            logger.exception("Crawl failed for ad %s: %s", ad_id, e)
+            return ad_id, url, e
+
+    if not ads:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ads))) as pool:
+        results = list(pool.map(_one, ads))
+    save_crawls([r for r in results if not isinstance(r[2], Exception)])
+    return [
+        {"ad_id": ad_id, "error": str(crawl)} if isinstance(crawl, Exception) else {"ad_id": ad_id, "id": crawl.pop("id"), **crawl}
+        for ad_id, _, crawl in results
+    ]
@@ -1,10 +1,12 @@
 """Creative threat detection: poll ATC for watchlist, diff vs previous snapshot, create alerts."""
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 from db import cursor, utc_now
 from services.atc_service import atc_list
+from utils import decompress_json
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +20,8 @@ def list_watchlist(job_id: int = None):
             )
         else:
             cur.execute("SELECT id, job_id, advertiser_domain, region, last_atc_snapshot_id, last_poll_at FROM competitor_watchlist ORDER BY id")
-        return [dict(r) for r in cur.fetchall()]
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
 
 
 def add_to_watchlist(job_id: int, advertiser_domain: str, region: str = "US"):
@@ -30,53 +33,73 @@ def add_to_watchlist(job_id: int, advertiser_domain: str, region: str = "US"):
         return cur.lastrowid
 
 
-def poll_watchlist_and_alert():
+def _creative_ids(creatives: list) -> set:
+    """Set of str ids (ad_id, else creative_id, else id) of the dict creatives that have one."""
+    ids = set()
+    for c in creatives:
+        if isinstance(c, dict):
+            cid = c.get("ad_id") or c.get("creative_id") or c.get("id")
+            if cid:
+                ids.add(str(cid))
+    return ids
+
+
+def _fetch_watchlist_entry(w: dict):
+    """ATC list for one watchlist entry as (result, None), or (None, exception) so one failure doesn't stop the poll."""
+    try:
+        return atc_list(w["advertiser_domain"], w["region"], 1), None
+    except Exception as e:
+        return None, e
+
+
+def poll_watchlist_and_alert(max_workers: int = 8):
     """For each watchlist entry, fetch ATC, diff with last snapshot, insert creative_alerts if new/removed."""
     now = utc_now()
-    for w in list_watchlist():
+    watchlist = list_watchlist()
+    if not watchlist:
+        return
+    # The ATC calls are independent network round-trips: fetch them together, then diff and write entry by entry.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(watchlist))) as pool:
+        fetched = list(pool.map(_fetch_watchlist_entry, watchlist))
+    for w, (out, error) in zip(watchlist, fetched):
         try:
-            out = atc_list(w["advertiser_domain"], w["region"], 1)
+            if error is not None:
+                raise error
             creatives = out.get("creatives") or []
             new_snap_id = None
+            prev_snap_id = w.get("last_atc_snapshot_id")
             with cursor() as cur:
+                # Latest snapshot id and the previous snapshot's payload in one round-trip.
                 cur.execute(
-                    "SELECT id, raw_json FROM atc_snapshots WHERE advertiser = ? AND region = ? ORDER BY synced_at_utc DESC LIMIT 1",
-                    (w["advertiser_domain"], w["region"]),
+                    """SELECT s_new.id AS new_id, s_prev.raw_json AS prev_json
+                    FROM atc_snapshots s_new LEFT JOIN atc_snapshots s_prev ON s_prev.id = ?
+                    WHERE s_new.advertiser = ? AND s_new.region = ?
+                    ORDER BY s_new.synced_at_utc DESC LIMIT 1""",
+                    (prev_snap_id, w["advertiser_domain"], w["region"]),
                 )
                 r = cur.fetchone()
-            if r:
-                new_snap_id = r["id"]
-            prev_snap_id = w.get("last_atc_snapshot_id")
-            if prev_snap_id and new_snap_id:
-                with cursor() as cur:
-                    cur.execute("SELECT raw_json FROM atc_snapshots WHERE id = ?", (prev_snap_id,))
-                    prev_r = cur.fetchone()
-                prev_data = json.loads(prev_r["raw_json"]) if prev_r and prev_r["raw_json"] else {}
-                prev_creatives = set()
-                for key in ("ads", "creatives", "results"):
-                    if isinstance(prev_data.get(key), list):
-                        for c in prev_data[key]:
-                            if isinstance(c, dict):
-                                cid = c.get("ad_id") or c.get("creative_id") or c.get("id")
-                                if cid:
-                                    prev_creatives.add(str(cid))
-                        break
-                new_ids = {str(c.get("ad_id") or c.get("creative_id") or c.get("id")) for c in creatives if c.get("ad_id") or c.get("creative_id") or c.get("id")}
-                added = new_ids - prev_creatives
-                removed = prev_creatives - new_ids
-                if added:
-                    with cursor() as cur:
+                if r:
+                    new_snap_id = r["new_id"]
+                if prev_snap_id and new_snap_id:
+                    prev_data = decompress_json(r["prev_json"]) or {}
+                    prev_creatives = set()
+                    for key in ("ads", "creatives", "results"):
+                        if isinstance(prev_data.get(key), list):
+                            prev_creatives = _creative_ids(prev_data[key])
+                            break
+                    new_ids = _creative_ids(creatives)
+                    added = new_ids - prev_creatives
+                    removed = prev_creatives - new_ids
+                    if added:
                         cur.execute(
                             "INSERT INTO creative_alerts (watchlist_id, type, previous_snapshot_id, new_snapshot_id, diff_summary_json, created_at) VALUES (?,?,?,?,?,?)",
                             (w["id"], "new_creative", prev_snap_id, new_snap_id, json.dumps({"added": list(added)[:20]}), now),
                         )
-                if removed:
-                    with cursor() as cur:
+                    if removed:
                         cur.execute(
                             "INSERT INTO creative_alerts (watchlist_id, type, previous_snapshot_id, new_snapshot_id, diff_summary_json, created_at) VALUES (?,?,?,?,?,?)",
                             (w["id"], "removed_creative", prev_snap_id, new_snap_id, json.dumps({"removed": list(removed)[:20]}), now),
                         )
-            with cursor() as cur:
                 cur.execute(
                     "UPDATE competitor_watchlist SET last_atc_snapshot_id = ?, last_poll_at = ? WHERE id = ?",
                     (new_snap_id, now, w["id"]),
@@ -0,0 +1,110 @@
+"""Batched, cached Gemini calls shared by the trigger and offer extraction services."""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from db import llm_cache_get, llm_cache_put
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "gemini-1.5-flash"
+# Ads per Gemini prompt: one round-trip answers the whole batch.
+GEMINI_BATCH_SIZE = 10
+# Concurrent Gemini requests per call; kept small to stay inside the API's rate limits.
+GEMINI_MAX_WORKERS = 6
+
+
+def _strip_fence(raw: str) -> str:
+    """Drop a ```json ... ``` fence around a model reply."""
+    raw = raw.strip()
+    if "```" in raw:
+        raw = raw.split("```")[1]
+        if raw.startswith("json"):
+            raw = raw[4:]
+    return raw
+
+
+def _ask_one(model, prompt: str, label: str):
+    """Single-ad fallback when a batched reply can't be used. None if the reply is unusable."""
+    try:
+        resp = model.generate_content(prompt)
+        return json.loads(_strip_fence(resp.text))
+    except Exception as e:
+        logger.warning("Gemini %s parse failed: %s", label, e)
+        return None
+
+
+def _ask_batch(model, prompt: str, n: int, label: str):
+    """Returns one dict per ad, or None if the reply isn't a JSON array with exactly one object per ad.
+
+    The batch prompt asks for an "i" (the ad's index) in each object; it is stripped from the results.
+    """
+    try:
+        resp = model.generate_content(prompt)
+        arr = json.loads(_strip_fence(resp.text))
+    except Exception as e:
+        logger.warning("Gemini %s batch parse failed (%s ads): %s", label, n, e)
+        return None
+    if not isinstance(arr, list) or len(arr) != n or not all(isinstance(o, dict) for o in arr):
+        logger.warning("Gemini %s batch reply had %s items for %s ads", label, len(arr) if isinstance(arr, list) else "no", n)
+        return None
+    # Trust the echoed indexes when they are complete, otherwise the reply order.
+    by_index = {o.get("i"): o for o in arr}
+    if set(by_index) == set(range(n)):
+        arr = [by_index[i] for i in range(n)]
+    return [{k: v for k, v in o.items() if k != "i"} for o in arr]
+
+
+def _call_gemini(items: list, one_prompt, batch_prompt, label: str) -> list:
+    """Ask Gemini about each item: one dict per item (None where the reply was unusable), or [] when Gemini isn't
+    available."""
+    try:
+        import google.generativeai as genai
+        from config import GEMINI_API_KEY
+
+        if not GEMINI_API_KEY:
+            return []
+        genai.configure(api_key=GEMINI_API_KEY)
+        model = genai.GenerativeModel(GEMINI_MODEL)
+
+        def _chunk(start):
+            batch = items[start : start + GEMINI_BATCH_SIZE]
+            out = _ask_batch(model, batch_prompt(batch), len(batch), label)
+            if out is None:
+                # Malformed batch reply: ask about just this batch's ads one by one.
+                out = [_ask_one(model, one_prompt(item), label) for item in batch]
+            return out
+
+        starts = range(0, len(items), GEMINI_BATCH_SIZE)
+        if not starts:
+            return []
+        # Batches are independent round-trips: run a few at once (capped for rate limits), results in ad order.
+        with ThreadPoolExecutor(max_workers=min(GEMINI_MAX_WORKERS, len(starts))) as pool:
+            return [result for chunk in pool.map(_chunk, starts) for result in chunk]
+    except ImportError:
+        return []
+    except Exception as e:
+        logger.exception("Gemini %s extraction failed: %s", label, e)
+        return []
+
+
+def ask_cached(items: list, *, prompt_version: str, one_prompt, batch_prompt, default, label: str, key=str) -> list:
+    """Gemini answer (a dict) per item, or [] when Gemini isn't available.
+
+    one_prompt(item) and batch_prompt(items) build the prompts; default() stands in for an unusable answer.
+    Answers are cached in llm_cache under key(item) and prompt_version (bump it when a prompt changes); only items
+    not seen before (each distinct one once) go to Gemini.
+    """
+    keys = [hashlib.sha256(f"{GEMINI_MODEL}|{prompt_version}|{key(item)}".encode()).hexdigest() for item in items]
+    known = llm_cache_get(keys)
+    todo = {k: item for k, item in zip(keys, items) if k not in known}
+    if todo:
+        fresh = _call_gemini(list(todo.values()), one_prompt, batch_prompt, label)
+        if len(fresh) != len(todo):
+            return []
+        # Failed replies are not cached (they come back as default()) so the next run retries them.
+        new = [(k, result) for k, result in zip(todo, fresh) if result is not None]
+        llm_cache_put(new)
+        known.update(new)
+    return [known.get(k) or default() for k in keys]
@@ -1,6 +1,7 @@
 """Automated LPE: batch PageSpeed for destination URLs, store in metrics time-series."""
 import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from db import cursor, utc_now
@@ -13,13 +14,17 @@ def _url_hash(url: str) -> str:
     return hashlib.sha256(url.encode()).hexdigest()[:16]
 
 
-def run_lpe_batch_for_job(job_id: int, days: int = 7, throttle_per_url_per_day: bool = True):
+def run_lpe_batch_for_job(job_id: int, days: int = 7, throttle_per_url_per_day: bool = True, max_workers: int = 8):
     """Collect unique destination URLs from ads in job (last N days), run PageSpeed, store in crawls + metrics."""
     cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
     with cursor() as cur:
+        # One row per landing URL (many ads share one), first-seen first; a range scan of the covering partial index
+        # idx_ads_job_dest_link.
         cur.execute(
-            """SELECT DISTINCT a.id, a.destination_link FROM ads a
-            WHERE a.job_id = ? AND a.created_at_utc >= ? AND a.destination_link IS NOT NULL AND a.destination_link != '' AND a.destination_link LIKE 'http%'""",
+            """SELECT MIN(a.id) AS id, a.destination_link FROM ads a
+            WHERE a.job_id = ? AND a.created_at_utc >= ? AND a.destination_link IS NOT NULL AND a.destination_link != '' AND a.destination_link LIKE 'http%'
+            GROUP BY a.destination_link
+            ORDER BY MIN(a.created_at_utc)""",
             (job_id, cutoff),
         )
         rows = cur.fetchall()
@@ -31,32 +36,47 @@ def run_lpe_batch_for_job(job_id: int, days: int = 7, throttle_per_url_per_day:
             continue
         seen_url.add(url)
         urls_to_run.append((r["id"], url))
+    if throttle_per_url_per_day and urls_to_run:
+        # PageSpeed scores move slowly: skip URLs already scored in the last 24h so the 50-call budget goes to new ones.
+        hashes = {_url_hash(url): url for _, url in urls_to_run}
+        since = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        keys = list(hashes)
+        recent = set()
+        with cursor() as cur:
+            # Chunked to stay well under SQLite's bound-parameter limit.
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                cur.execute(
+                    f"""SELECT DISTINCT entity_id FROM metrics
+                    WHERE entity_type = 'lpe_url' AND entity_id IN ({','.join('?' * len(chunk))}) AND metric_name = 'performance' AND timestamp_utc >= ?""",
+                    (*chunk, since),
+                )
+                recent.update(hashes[r["entity_id"]] for r in cur.fetchall())
+        urls_to_run = [(ad_id, url) for ad_id, url in urls_to_run if url not in recent]
+    urls = [url for _, url in urls_to_run[:50]]
+    if not urls:
+        return 0
+    rows = []
     count = 0
-    for ad_id, url in urls_to_run[:50]:
-        psi = pagespeed_insights(url)
+    # PageSpeed calls take seconds each and are pure network wait: run them concurrently, keep results in URL order.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls)), thread_name_prefix="lpe") as pool:
+        results = list(pool.map(pagespeed_insights, urls))
+    for url, psi in zip(urls, results):
         if not psi:
             continue
         now = utc_now()
+        url_hash = _url_hash(url)
+        rows.extend(
+            (now, "lpe_url", url_hash, name, psi.get(name))
+            for name in ("performance", "accessibility", "best_practices", "seo")
+        )
+        count += 1
+    # All URLs' scores in one transaction instead of a commit per URL.
+    if rows:
         with cursor() as cur:
-            cur.execute(
+            cur.executemany(
                 """INSERT INTO metrics (timestamp_utc, entity_type, entity_id, metric_name, value)
                 VALUES (?,?,?,?,?)""",
-                (now, "lpe_url", _url_hash(url), "performance", psi.get("performance")),
+                rows,
             )
-            cur.execute(
-                """INSERT INTO metrics (timestamp_utc, entity_type, entity_id, metric_name, value)
-                VALUES (?,?,?,?,?)""",
-                (now, "lpe_url", _url_hash(url), "accessibility", psi.get("accessibility")),
-            )
-            cur.execute(
-                """INSERT INTO metrics (timestamp_utc, entity_type, entity_id, metric_name, value)
-                VALUES (?,?,?,?,?)""",
-                (now, "lpe_url", _url_hash(url), "best_practices", psi.get("best_practices")),
-            )
-            cur.execute(
-                """INSERT INTO metrics (timestamp_utc, entity_type, entity_id, metric_name, value)
-                VALUES (?,?,?,?,?)""",
-                (now, "lpe_url", _url_hash(url), "seo", psi.get("seo")),
-            )
-        count += 1
     return count
@@ -4,46 +4,44 @@ import logging
 from datetime import datetime, timezone
 
 from db import cursor, utc_now
+from services.gemini_service import ask_cached
 
 logger = logging.getLogger(__name__)
 
 
-def _gemini_extract_offers(texts: list) -> list:
-    """Call Gemini to extract offer entities. Returns list of dicts per ad."""
-    try:
-        import google.generativeai as genai
-        from config import GEMINI_API_KEY
+# Part of the llm_cache key: bump when the prompt or keys change so old answers aren't reused.
+PROMPT_VERSION = "offers-v1"
+_OFFER_KEYS = """Keys: financing_rate (e.g. "0% APR"), guarantee_text, free_trial_days (number or null), discount_type (e.g. "20% off"), other_promotion (string or null).
+If not present use null."""
+
 
-        if not GEMINI_API_KEY:
-            return []
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        results = []
-        for text in texts:
-            prompt = """Extract structured offer entities from this ad copy. Respond with JSON only.
-Keys: financing_rate (e.g. "0% APR"), guarantee_text, free_trial_days (number or null), discount_type (e.g. "20% off"), other_promotion (string or null).
-If not present use null.
+def _one_prompt(text: str) -> str:
+    return """Extract structured offer entities from this ad copy. Respond with JSON only.
+""" + _OFFER_KEYS + """
 
 Ad copy:
 """ + text[:2000]
-            try:
-                resp = model.generate_content(prompt)
-                raw = resp.text.strip()
-                if "```" in raw:
-                    raw = raw.split("```")[1]
-                    if raw.startswith("json"):
-                        raw = raw[4:]
-                obj = json.loads(raw)
-                results.append(obj)
-            except Exception as e:
-                logger.warning("Gemini offer parse failed: %s", e)
-                results.append({})
-        return results
-    except ImportError:
-        return []
-    except Exception as e:
-        logger.exception("Gemini offer extraction failed: %s", e)
-        return []
+
+
+def _batch_prompt(batch: list) -> str:
+    ads_json = json.dumps([{"i": i, "ad_copy": text[:2000]} for i, text in enumerate(batch)])
+    return """Extract structured offer entities from each of the following ads. Respond with a JSON array only, one object per ad in the same order, each with "i" (the ad's index) plus these keys.
+""" + _OFFER_KEYS + """
+
+Ads:
+""" + ads_json
+
+
+def _gemini_extract_offers(texts: list) -> list:
+    """Extract offer entities. Returns list of dicts per ad ({} where Gemini's answer was unusable)."""
+    return ask_cached(
+        texts,
+        prompt_version=PROMPT_VERSION,
+        one_prompt=_one_prompt,
+        batch_prompt=_batch_prompt,
+        default=dict,
+        label="offer",
+    )
 
 
 def extract_offers_for_ads(ad_ids: list, source: str = "serp"):
@@ -62,22 +60,25 @@ def extract_offers_for_ads(ad_ids: list, source: str = "serp"):
     if len(extracted) != len(ads):
         return 0
     now = utc_now()
+    rows = [
+        (
+            ad["id"],
+            source,
+            ex.get("financing_rate"),
+            ex.get("guarantee_text"),
+            ex.get("free_trial_days"),
+            ex.get("discount_type"),
+            json.dumps(ex.get("other_promotion")) if ex.get("other_promotion") else None,
+            text[:500],
+            "gemini",
+            now,
+        )
+        for ad, ex, text in zip(ads, extracted, texts)
+    ]
     with cursor() as cur:
-        for i, (ad, ex) in enumerate(zip(ads, extracted)):
-            cur.execute(
-                """INSERT OR REPLACE INTO extracted_offers (ad_id, source, financing_rate, guarantee_text, free_trial_days, discount_type, other_promotion_json, raw_snippet, model_used, synced_at)
-                VALUES (?,?,?,?,?,?,?,?,?,?)""",
-                (
-                    ad["id"],
-                    source,
-                    ex.get("financing_rate"),
-                    ex.get("guarantee_text"),
-                    ex.get("free_trial_days"),
-                    ex.get("discount_type"),
-                    json.dumps(ex.get("other_promotion")) if ex.get("other_promotion") else None,
-                    texts[i][:500] if i < len(texts) else "",
-                    "gemini",
-                    now,
-                ),
-            )
+        cur.executemany(
+            """INSERT OR REPLACE INTO extracted_offers (ad_id, source, financing_rate, guarantee_text, free_trial_days, discount_type, other_promotion_json, raw_snippet, model_used, synced_at)
+            VALUES (?,?,?,?,?,?,?,?,?,?)""",
+            rows,
+        )
     return len(ads)
@@ -1,34 +1,41 @@
 """SerpAPI service: run Google Search and store snapshots + ads."""
-import json
+import functools
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+import orjson
 
 from config import SERPAPI_API_KEY
-from db import cursor, utc_now
-from utils import redact_api_keys
+from db import cursor, optimize, utc_now
+from utils import build_session, compress_json, redact_api_keys
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://serpapi.com/search"
+# Bare US ZIP: 5 digits or ZIP+4 (with or without the hyphen)
+_ZIP_RE = re.compile(r"\d{5}(?:-?\d{4})?")
+# Shared keep-alive session (SerpAPI only, so landing-page crawl headers stay separate).
+_session = build_session()
 
 
 def _search(params: dict) -> dict:
     if not SERPAPI_API_KEY:
         raise ValueError("SERPAPI_API_KEY is not set")
     params = {**params, "api_key": SERPAPI_API_KEY}
-    r = requests.get(BASE_URL, params=params, timeout=60)
+    r = _session.get(BASE_URL, params=params, timeout=60)
     if not r.ok:
         err_msg = str(r.status_code)
         try:
-            body = r.json()
+            body = orjson.loads(r.content)
             if isinstance(body, dict) and body.get("error"):
                 err_msg = f"{r.status_code}: {body['error']}"
         except Exception:
             if r.text:
                 err_msg = f"{r.status_code}: {r.text[:200]}"
         raise ValueError(redact_api_keys(err_msg))
-    return r.json()
+    # Responses run to hundreds of KB; orjson parses them several times faster than r.json().
+    return orjson.loads(r.content)
 
 
 def _location_for_serpapi(location: str, gl: str) -> str:
@@ -37,7 +44,7 @@ def _location_for_serpapi(location: str, gl: str) -> str:
     if not loc:
         return "United States" if (gl or "us").lower() == "us" else loc
     # If it's a bare US ZIP (5 digits or 5+4), use a format that often works: "ZIP, State, United States" or fallback to US.
-    if loc.isdigit() and len(loc) in (5, 9):
+    if _ZIP_RE.fullmatch(loc):
         # Common ZIPs -> city, state for better SerpAPI acceptance
         zip_to_place = {
             "85001": "Phoenix, Arizona, United States",
@@ -55,34 +62,34 @@ def _location_for_serpapi(location: str, gl: str) -> str:
 
 
 def _extract_ads_from_serp(result: dict):
-    """Extract paid ads from SerpAPI Google result. Handles both 'ads' and 'paid' keys."""
+    """Extract paid ads from SerpAPI Google result. Handles both 'ads' and 'paid' keys.
+
+    Each ad dict is read once; the advertiser domain is derived here too so callers don't re-scan the links.
+    """
     ads = result.get("ads") or result.get("paid") or []
     out = []
     for i, ad in enumerate(ads):
         if not isinstance(ad, dict):
             continue
+        g = ad.get
         # Normalize common field names
-        headline = ad.get("title") or ad.get("headline") or ""
-        desc = ad.get("description") or ad.get("snippet") or ""
-        link = ad.get("link") or ad.get("destination_link") or ""
-        displayed = ad.get("displayed_link") or ad.get("display_link") or ""
-        block = ad.get("block") or ("top" if i < 4 else "bottom")
-        extensions = ad.get("extensions") or ad.get("sitelinks") or []
-        if isinstance(extensions, list):
-            ext_list = extensions
-        else:
-            ext_list = [extensions] if extensions else []
-        ad_id = ad.get("ad_id") or ad.get("position") or str(i)
+        link = g("link") or g("destination_link") or ""
+        displayed = g("displayed_link") or g("display_link") or ""
+        extensions = g("extensions") or g("sitelinks") or []
+        if not isinstance(extensions, list):
+            extensions = [extensions] if extensions else []
+        position = g("position")
         out.append({
-            "ad_id": str(ad_id),
-            "headline": headline,
-            "description": desc,
+            "ad_id": str(g("ad_id") or position or i),
+            "advertiser": _domain_from_link(displayed or link or "unknown"),
+            "headline": g("title") or g("headline") or "",
+            "description": g("description") or g("snippet") or "",
             "destination_link": link,
             "displayed_link": displayed,
-            "block": str(block),
-            "position": ad.get("position", i + 1),
-            "extensions": ext_list,
-            "offers": ad.get("offers") or [],
+            "block": str(g("block") or ("top" if i < 4 else "bottom")),
+            "position": g("position", i + 1),
+            "extensions": extensions,
+            "offers": g("offers") or [],
         })
     return out
 
@@ -93,38 +100,41 @@ def run_target(target_id: int, job_id: int, keyword: str, location: str, gl: str
     location = _location_for_serpapi(location, gl)
     devices = ["desktop", "mobile"]
     snapshot_count = 0
-    for device in devices:
-        params = {
-            "q": keyword,
-            "engine": "google",
-            "location": location,
-            "gl": gl,
-            "hl": hl,
-            "device": device,
+    # Both device searches are independent round-trips: issue them together, store in device order.
+    with ThreadPoolExecutor(max_workers=len(devices)) as pool:
+        futures = {
+            device: pool.submit(
+                _search,
+                {"q": keyword, "engine": "google", "location": location, "gl": gl, "hl": hl, "device": device},
+            )
+            for device in devices
         }
+    results, error = [], None
+    for device in devices:
         try:
-            result_dict = _search(params)
+            results.append((device, futures[device].result()))
         except Exception as e:
             logger.exception("SerpAPI search failed for target %s device %s: %s", target_id, device, e)
-            raise
-        with cursor() as cur:
+            error = e
+            break
+    # Every device's snapshot + ads commit in one transaction; ads go in with a single executemany per snapshot.
+    with cursor() as cur:
+        for device, result_dict in results:
+            ads = _extract_ads_from_serp(result_dict)
             cur.execute(
                 """INSERT INTO serp_snapshots (target_id, device, captured_at_utc, raw_json) VALUES (?,?,?,?)""",
-                (target_id, device, now, json.dumps(result_dict)[:50000] if result_dict else None),
+                (target_id, device, now, compress_json(result_dict) if result_dict else None),
             )
             snap_id = cur.lastrowid
-        snapshot_count += 1
-        ads = _extract_ads_from_serp(result_dict)
-        with cursor() as cur:
-            for ad in ads[:100]:
-                cur.execute(
-                    """INSERT INTO ads (snapshot_id, job_id, advertiser, ad_id, device, block, headline, description,
-                    displayed_link, destination_link, position, created_at_utc, extensions_json, offers_json)
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+            cur.executemany(
+                """INSERT INTO ads (snapshot_id, job_id, advertiser, ad_id, device, block, headline, description,
+                displayed_link, destination_link, position, created_at_utc, extensions_json, offers_json)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                [
                     (
                         snap_id,
                         job_id,
-                        _domain_from_link(ad.get("displayed_link") or ad.get("destination_link") or "unknown"),
+                        ad["advertiser"],
                         ad.get("ad_id"),
                         device,
                         ad.get("block"),
@@ -134,13 +144,52 @@ def run_target(target_id: int, job_id: int, keyword: str, location: str, gl: str
                         ad.get("destination_link"),
                         ad.get("position"),
                         now,
-                        json.dumps(ad.get("extensions") or []),
-                        json.dumps(ad.get("offers") or []),
-                    ),
-                )
+                        orjson.dumps(ad["extensions"]).decode() if ad["extensions"] else None,
+                        orjson.dumps(ad["offers"]).decode() if ad["offers"] else None,
+                    )
+                    for ad in ads[:100]
+                ],
+            )
+            snapshot_count += 1
+    if error is not None:
+        raise error
     return snapshot_count
 
 
+def run_targets(job_id: int, targets: list, max_workers: int = 8):
+    """Run many targets concurrently (SerpAPI calls are I/O-bound). Returns {"snapshots": n, "failed": [target ids]}."""
+
+    def _one(t):
+        try:
+            return t["id"], run_target(
+                t["id"],
+                job_id,
+                t["keyword"],
+                t["serp_location"] or t["location_input"],
+                t["gl"] or "us",
+                t["hl"] or "en",
+            )
+        except Exception as e:
+            logger.warning("Run failed for target %s: %s", t["id"], redact_api_keys(str(e)))
+            return t["id"], None
+
+    snapshots, failed = 0, []
+    if not targets:
+        return {"snapshots": 0, "failed": []}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets))) as pool:
+        for target_id, count in pool.map(_one, targets):
+            if count is None:
+                failed.append(target_id)
+            else:
+                snapshots += count
+    if snapshots:
+        # A run adds many ads at once; keep the planner's row estimates in step.
+        optimize()
+    return {"snapshots": snapshots, "failed": failed}
+
+
+# Same few advertisers recur across every run, so memoize on the raw link string.
+@functools.lru_cache(maxsize=4096)
 def _domain_from_link(link: str) -> str:
     """Extract domain from URL for use as advertiser name."""
     if not link:
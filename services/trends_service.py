@@ -1,28 +1,44 @@
 """Google Trends via SerpAPI. Real data or error only—no placeholder data."""
+import hashlib
 import logging
-from datetime import datetime, timezone
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
-import requests
+import orjson
 
 from config import SERPAPI_API_KEY
+from db import cursor, read_cursor, utc_now
+from utils import build_session, compress_json, decompress_json, split_keywords
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://serpapi.com/search"
+# Keep-alive session with retry/backoff; the background refresh pool shares it.
+_session = build_session(pool_maxsize=8)
+# Trends move slowly; cached series are served for this long before a background refresh.
+CACHE_TTL = timedelta(hours=6)
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="trends")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
 
 
 def _search(params: dict) -> dict:
     if not SERPAPI_API_KEY:
         return None
     params = {**params, "api_key": SERPAPI_API_KEY}
-    r = requests.get(BASE_URL, params=params, timeout=60)
+    r = _session.get(BASE_URL, params=params, timeout=60)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
+
+
+def _keyword_list(keywords: str) -> list:
+    return split_keywords(keywords)[:5]
 
 
 def fetch_trends(keywords: str, geo: str = "US", timeframe: str = "today 12-m"):
     """Fetch trend series for keywords. Returns dict with series (list of {keyword, points: [{t, v}]}), synced_at_utc, error."""
-    kw_list = [k.strip() for k in keywords.replace("\n", ",").split(",") if k.strip()][:5]
+    kw_list = _keyword_list(keywords)
     if not kw_list:
         return {"series": [], "synced_at_utc": None, "error": "No keywords provided"}
     data = None
@@ -40,35 +56,80 @@ def fetch_trends(keywords: str, geo: str = "US", timeframe: str = "today 12-m"):
     series = []
     timeline = data.get("interest_over_time", {}).get("timeline_data") or data.get("timeline_data") or []
     if timeline:
-        for kw_idx, kw in enumerate(kw_list):
-            points = []
-            for d in timeline:
-                if not isinstance(d, dict):
-                    continue
-                t = d.get("date") or d.get("timestamp")
-                vals = d.get("values") or []
-                # SerpAPI returns values in same order as queries; or each item has "query" and "value"/"extracted_value"
-                if len(kw_list) == 1:
-                    item = vals[0] if vals else {}
-                else:
-                    item = None
-                    for v in vals:
-                        if isinstance(v, dict) and (v.get("query") or "").strip().lower() == kw.lower():
-                            item = v
-                            break
+        # One pass over the timeline filling every keyword's points; queries are matched case-insensitively, so
+        # lowercase the keywords once up front.
+        kw_lower = [kw.lower() for kw in kw_list]
+        points = [[] for _ in kw_list]
+        for d in timeline:
+            if not isinstance(d, dict):
+                continue
+            t = d.get("date") or d.get("timestamp")
+            if not t:
+                continue
+            t = t[:10] if len(str(t)) >= 10 else str(t)
+            vals = d.get("values") or []
+            # SerpAPI returns values in same order as queries; or each item has "query" and "value"/"extracted_value"
+            if len(kw_list) == 1:
+                items = [vals[0] if vals else {}]
+            else:
+                by_query = {}
+                for v in vals:
+                    if isinstance(v, dict):
+                        by_query.setdefault((v.get("query") or "").strip().lower(), v)
+                items = []
+                for kw_idx, kw in enumerate(kw_lower):
+                    item = by_query.get(kw)
                     if item is None and kw_idx < len(vals):
                         item = vals[kw_idx] if isinstance(vals[kw_idx], dict) else {}
-                    else:
-                        item = item or {}
+                    items.append(item or {})
+            for kw_points, item in zip(points, items):
                 v = item.get("extracted_value") or item.get("value") or 0
                 try:
                     v = int(v) if not isinstance(v, (int, float)) else v
                 except (TypeError, ValueError):
                     v = 0
-                if t:
-                    points.append({"t": t[:10] if len(str(t)) >= 10 else str(t), "v": v})
-            series.append({"keyword": kw, "points": points})
+                kw_points.append({"t": t, "v": v})
+        series = [{"keyword": kw, "points": kw_points} for kw, kw_points in zip(kw_list, points)]
     if not series:
         return {"series": [], "synced_at_utc": None, "error": "No trend data in response."}
     return {"series": series, "synced_at_utc": now, "error": None}
 
+
+def cached_trends(keywords: str, geo: str = "US", timeframe: str = "today 12-m"):
+    """fetch_trends behind the trends_cache table (stale-while-revalidate).
+
+    Fresh entries come straight from SQLite; stale ones are returned as-is while a background refresh runs.
+    Only a cold miss waits on SerpAPI.
+    """
+    kw_list = _keyword_list(keywords)
+    if not kw_list:
+        return fetch_trends(keywords, geo, timeframe)
+    key = hashlib.sha1(orjson.dumps([kw_list, geo, timeframe])).hexdigest()
+    with read_cursor() as cur:
+        cur.execute("SELECT fetched_at_utc, payload FROM trends_cache WHERE key = ?", (key,))
+        row = cur.fetchone()
+    if row is None:
+        return _refresh(key, kw_list, geo, timeframe)
+    stale_before = (datetime.now(timezone.utc) - CACHE_TTL).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if row["fetched_at_utc"] < stale_before:
+        with _refreshing_lock:
+            if key not in _refreshing:
+                _refreshing.add(key)
+                _refresh_pool.submit(_refresh, key, kw_list, geo, timeframe)
+    return decompress_json(row["payload"])
+
+
+def _refresh(key: str, kw_list: list, geo: str, timeframe: str):
+    """Fetch live and store in trends_cache (errors are returned but never cached)."""
+    try:
+        out = fetch_trends(",".join(kw_list), geo, timeframe)
+        if not out.get("error"):
+            with cursor() as cur:
+                cur.execute(
+                    "INSERT OR REPLACE INTO trends_cache (key, fetched_at_utc, payload) VALUES (?,?,?)",
+                    (key, utc_now(), compress_json(out)),
+                )
+        return out
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
@@ -4,6 +4,7 @@ import logging
 from datetime import datetime, timezone
 
 from db import cursor, utc_now
+from services.gemini_service import ask_cached
 
 logger = logging.getLogger(__name__)
 
@@ -19,43 +20,43 @@ TRIGGERS = [
 ]
 
 
-def _gemini_classify(headlines: list, descriptions: list) -> list:
-    """Call Gemini to classify ad copy into triggers. Returns list of dicts {trigger_name: score} per ad."""
-    try:
-        import google.generativeai as genai
-        from config import GEMINI_API_KEY
-
-        if not GEMINI_API_KEY:
-            return []
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        results = []
-        for i, (h, d) in enumerate(zip(headlines, descriptions)):
-            text = f"Headline: {h}\nDescription: {d}"
-            prompt = f"""Classify the following ad copy into these psychological triggers. For each trigger, respond with 0 or 1 (1 if present).
+# Part of the llm_cache key: bump when the prompt or TRIGGERS change so old answers aren't reused.
+PROMPT_VERSION = "triggers-v1"
+
+
+def _one_prompt(pair) -> str:
+    h, d = pair
+    text = f"Headline: {h}\nDescription: {d}"
+    return f"""Classify the following ad copy into these psychological triggers. For each trigger, respond with 0 or 1 (1 if present).
 Triggers: {', '.join(TRIGGERS)}
 Respond with a JSON object only, keys are trigger names, values are 0 or 1. Example: {{"Scarcity": 0, "Urgency": 1, ...}}
 
 Ad copy:
 {text}"""
-            try:
-                resp = model.generate_content(prompt)
-                raw = resp.text.strip()
-                if raw.startswith("```"):
-                    raw = raw.split("```")[1]
-                    if raw.startswith("json"):
-                        raw = raw[4:]
-                obj = json.loads(raw)
-                results.append(obj)
-            except Exception as e:
-                logger.warning("Gemini parse failed for ad %s: %s", i, e)
-                results.append({t: 0 for t in TRIGGERS})
-        return results
-    except ImportError:
-        return []
-    except Exception as e:
-        logger.exception("Gemini trigger extraction failed: %s", e)
-        return []
+
+
+def _batch_prompt(batch: list) -> str:
+    ads_json = json.dumps([{"i": i, "headline": h, "description": d} for i, (h, d) in enumerate(batch)])
+    return f"""Classify each of the following ads into these psychological triggers. For each trigger, respond with 0 or 1 (1 if present).
+Triggers: {', '.join(TRIGGERS)}
+Respond with a JSON array only, one object per ad in the same order. Each object has "i" (the ad's index) and the trigger names as keys, values are 0 or 1. Example: [{{"i": 0, "Scarcity": 0, "Urgency": 1, ...}}]
+
+Ads:
+{ads_json}"""
+
+
+def _gemini_classify(headlines: list, descriptions: list) -> list:
+    """Classify ad copy into triggers. Returns list of dicts {trigger_name: score} per ad (all-zero where Gemini's
+    answer was unusable)."""
+    return ask_cached(
+        list(zip(headlines, descriptions)),
+        prompt_version=PROMPT_VERSION,
+        one_prompt=_one_prompt,
+        batch_prompt=_batch_prompt,
+        default=lambda: {t: 0 for t in TRIGGERS},
+        label="trigger",
+        key=lambda pair: f"{pair[0]}\n{pair[1]}",
+    )
 
 
 def extract_triggers_for_ads(ad_ids: list):
@@ -75,16 +76,18 @@ def extract_triggers_for_ads(ad_ids: list):
     if len(classifications) != len(ads):
         return 0
     now = utc_now()
+    rows = [
+        (ad["id"], trigger_name, float(score) if isinstance(score, (int, float)) else 0, "gemini", now)
+        for ad, scores in zip(ads, classifications)
+        for trigger_name, score in scores.items()
+        if trigger_name in TRIGGERS
+    ]
     with cursor() as cur:
-        for ad, scores in zip(ads, classifications):
-            for trigger_name, score in scores.items():
-                if trigger_name not in TRIGGERS:
-                    continue
-                cur.execute(
-                    """INSERT OR REPLACE INTO ad_trigger_scores (ad_id, trigger_name, score, model_used, synced_at)
-                    VALUES (?,?,?,?,?)""",
-                    (ad["id"], trigger_name, float(score) if isinstance(score, (int, float)) else 0, "gemini", now),
-                )
+        cur.executemany(
+            """INSERT OR REPLACE INTO ad_trigger_scores (ad_id, trigger_name, score, model_used, synced_at)
+            VALUES (?,?,?,?,?)""",
+            rows,
+        )
     return len(ads)
 
 
@@ -0,0 +1,101 @@
+"""Background tasks: run slow SerpAPI / crawl / scan work off the request thread.
+
+Status lives in the `tasks` table (not in memory) so any gunicorn worker can answer /api/task/<id>.
+"""
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from db import cursor, read_cursor, utc_now
+from utils import redact_api_keys
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="task")
+_done_hooks = []
+
+# Finished tasks older than this are pruned on the next submit.
+KEEP_DAYS = 7
+# Tasks still pending/running this long after creation died with their process (restart, crash); they are marked failed.
+STALE_HOURS = 2
+
+
+def _ago(**delta) -> str:
+    return (datetime.now(timezone.utc) - timedelta(**delta)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def on_done(hook):
+    """Register hook() to be called after any task finishes (e.g. to clear response caches).
+
+    Hooks run in the process that ran the task: a hook clearing an in-process cache leaves other gunicorn workers'
+    copies alone, so those serve stale data until their own TTL (60s for app._response_cache) expires.
+    """
+    _done_hooks.append(hook)
+    return hook
+
+
+def submit(kind: str, fn, *args, job_id: int = None, **kwargs) -> str:
+    """Run fn(*args, **kwargs) in the background; return the task id."""
+    task_id = uuid.uuid4().hex
+    fail_stale()
+    with cursor() as cur:
+        cur.execute("DELETE FROM tasks WHERE finished_at_utc IS NOT NULL AND finished_at_utc < ?", (_ago(days=KEEP_DAYS),))
+        cur.execute(
+            "INSERT INTO tasks (id, kind, job_id, status, created_at_utc) VALUES (?,?,?,?,?)",
+            (task_id, kind, job_id, "pending", utc_now()),
+        )
+    _executor.submit(_run, task_id, kind, fn, args, kwargs)
+    return task_id
+
+
+def fail_stale():
+    """Mark tasks stuck in pending/running for over STALE_HOURS as failed (their worker is gone)."""
+    with cursor() as cur:
+        cur.execute(
+            """UPDATE tasks SET status = 'failed', error = 'Task was interrupted', finished_at_utc = ?
+            WHERE status IN ('pending', 'running') AND created_at_utc < ?""",
+            (utc_now(), _ago(hours=STALE_HOURS)),
+        )
+
+
+def _run(task_id: str, kind: str, fn, args, kwargs):
+    status, result_json, error = "done", None, None
+    try:
+        with cursor() as cur:
+            cur.execute("UPDATE tasks SET status = 'running' WHERE id = ?", (task_id,))
+        result_json = json.dumps(fn(*args, **kwargs), default=str)
+    except Exception as e:
+        logger.exception("Task %s (%s) failed: %s", task_id, kind, e)
+        status, error = "failed", redact_api_keys(str(e))[:500]
+    try:
+        with cursor() as cur:
+            cur.execute(
+                "UPDATE tasks SET status = ?, result_json = ?, error = ?, finished_at_utc = ? WHERE id = ?",
+                (status, result_json, error, utc_now(), task_id),
+            )
+    except Exception as e:
+        # Left pending/running; fail_stale() marks it failed later.
+        logger.exception("Task %s (%s): could not record status: %s", task_id, kind, e)
+    for hook in _done_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.warning("Task done hook failed: %s", e)
+
+
+def get_task(task_id: str):
+    """Return task status dict (with parsed result) or None."""
+    with read_cursor() as cur:
+        cur.execute(
+            "SELECT id, kind, job_id, status, result_json, error, created_at_utc, finished_at_utc FROM tasks WHERE id = ?",
+            (task_id,),
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    out = dict(row)
+    raw = out.pop("result_json")
+    out["result"] = json.loads(raw) if raw else None
+    return out
@@ -1,13 +1,103 @@
 """Shared utilities."""
 import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Match api_key= followed by value (alphanumeric, hyphen, underscore) until next & or end
+_API_KEY_RE = re.compile(r"api_key=[a-zA-Z0-9_-]+", re.IGNORECASE)
+# Also key= in case some APIs use different param name
+_KEY_RE = re.compile(r"key=[a-zA-Z0-9_-]{20,}", re.IGNORECASE)
 
 
 def redact_api_keys(text: str) -> str:
     """Remove API keys from error messages/URLs so they are never shown to users."""
     if not text or not isinstance(text, str):
         return text
-    # Match api_key= followed by value (alphanumeric, hyphen, underscore) until next & or end
-    text = re.sub(r"api_key=[a-zA-Z0-9_-]+", "api_key=***REDACTED***", text, flags=re.IGNORECASE)
-    # Also key= in case some APIs use different param name
-    text = re.sub(r"key=[a-zA-Z0-9_-]{20,}", "key=***REDACTED***", text, flags=re.IGNORECASE)
+    # Both patterns need "key=": most messages have none, so skip the two regex passes.
+    if "key=" not in text.lower():
+        return text
+    text = _API_KEY_RE.sub("api_key=***REDACTED***", text)
+    text = _KEY_RE.sub("key=***REDACTED***", text)
     return text
+
+
+# Keyword lists are comma and/or newline separated; fold both onto "," so one C-level split does it.
+_KW_TRANS = str.maketrans({"\n": ","})
+
+
+def split_keywords(raw: str) -> list:
+    """Split a comma/newline separated keyword blob into stripped, non-empty keywords."""
+    return [k for k in (part.strip() for part in (raw or "").translate(_KW_TRANS).split(",")) if k]
+
+
+def compress_json(obj) -> bytes:
+    """Compact-serialize obj and zlib-compress it for BLOB storage (raw API payloads)."""
+    return zlib.compress(orjson.dumps(obj), 6)
+
+
+def decompress_json(raw):
+    """Inverse of compress_json; also accepts legacy plain-text JSON rows. Returns None for empty."""
+    if not raw:
+        return None
+    if isinstance(raw, bytes):
+        raw = zlib.decompress(raw)
+    return orjson.loads(raw)
+
+
+class TTLCache:
+    """Small thread-safe in-process cache with per-entry expiry and a size cap."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def build_session(retries: int = 3, pool_maxsize: int = 64, headers: dict = None) -> requests.Session:
+    """Keep-alive requests.Session with a sized connection pool and retry/backoff on 429/5xx."""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session